@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import getopt
+import socket
+import platform
+import importlib
+import subprocess
+from generate_configuration import Config
+from model_builder import run_logged, log_dir, failed_states
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+###############################################
+# END TO END BENCHMARK
+###############################################
+# Builds every shipped configuration once per engine from scratch, one job at a
+# time so the timings do not compete for the CPU.  Each job runs in a fresh
+# interpreter, not a pool worker, so its build graph runs in parallel as a
+# normal build does (graph_workers records how wide), and records:
+#
+#   seconds    import, configure and run, the counts below are not included
+#   stages     seconds per build graph node from the build trace, plus import
+#              and configure and the whole run
+#   memory     peak resident set of the job or of its largest graph worker in MB
+#   artifacts  bytes of every file run() wrote, with face and triangle counts
+#              for STEP files (tessellated at mesh_tolerance), SCAD text has none
+#
+# The results go to results_file.  Given a baseline, every metric that grew by
+# more than the threshold is reported as a regression.  Without one the
+# comparison is skipped, and that is said in the output.
+
+config_modules = {
+    'default': 'generate_configuration',
+    'test': 'generate_configuration_test',
+    'orbyl_test': 'generate_configuration_orbyl_test',
+    'mklasklasd': 'generate_configuration_mklasklasd',
+}
+
+engines = ('solid', 'cadquery')
+
+results_file = os.path.join(r"..", "things", "benchmark.json")
+
+# Not shipped, timings only compare on the same machine.  Store one from a known
+# good run with --update-baseline before comparing.
+baseline_file = os.path.join(r"..", "things", "benchmark_baseline.json")
+
+# Relative growth of a metric over its baseline value that counts as a regression.
+regression_threshold = 0.1
+
+# Stages shorter than this in the baseline are too noisy to compare.
+min_stage_seconds = 1.0
+
+mesh_tolerance = 0.1
+
+
+def benchmark_jobs(configs=None, engine_names=None):
+    jobs = []
+    for name, module in config_modules.items():
+        if configs and name not in configs:
+            continue
+        shape_config = importlib.import_module(module).shape_config
+        for engine in engines:
+            if engine_names and engine not in engine_names:
+                continue
+            job = dict(shape_config)
+            job['ENGINE'] = engine
+            job['save_dir'] = "benchmark_{}_{}".format(name, engine)
+            # A full build every time, nothing from the cache or an earlier manifest.
+            job['build_cache_dir'] = None
+            job['trace_file'] = 'trace.json'
+            jobs.append(("{}_{}".format(name, engine), job))
+    return jobs
+
+
+def peak_memory():
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # kB on Linux, bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def stage_seconds(events):
+    stages = {}
+    for event in events:
+        if event['cat'] == 'graph' or event['name'] == 'run':
+            stages[event['name']] = stages.get(event['name'], 0) + event['dur'] / 1e6
+    return stages
+
+
+def mesh_counts(fname):
+    if not fname.endswith('.step'):
+        return None, None
+    import cadquery as cq
+    shapes = cq.importers.importStep(fname).vals()
+    shape = shapes[0] if len(shapes) == 1 else cq.Compound.makeCompound(shapes)
+    vertices, triangles = shape.tessellate(mesh_tolerance)
+    return len(shape.Faces()), len(triangles)
+
+
+def artifact_stats(files):
+    artifacts = {}
+    for fname in files:
+        faces, triangles = mesh_counts(fname)
+        artifacts[os.path.basename(fname)] = {
+            'bytes': os.path.getsize(fname),
+            'faces': faces,
+            'triangles': triangles,
+        }
+    return artifacts
+
+
+def total(artifacts, item):
+    values = [stats[item] for stats in artifacts.values() if stats[item] is not None]
+    return sum(values) if values else None
+
+
+def benchmark_job(name, job):
+    # Runs in its own interpreter, so the peak memory and the module state belong to this job alone.
+    record = {'name': name, 'engine': job['ENGINE']}
+
+    def build():
+        start = time.perf_counter()
+        import build_trace
+        import dactyl_manuform
+        dactyl_manuform.configure(Config(**job))
+        stages = {'configure': time.perf_counter() - start}
+        record['graph_workers'] = dactyl_manuform.new_graph().worker_count()
+
+        manifest = os.path.join(dactyl_manuform.save_path, dactyl_manuform.manifest_file)
+        if os.path.isfile(manifest):
+            os.remove(manifest)
+        dactyl_manuform.run()
+        record['seconds'] = round(time.perf_counter() - start, 3)
+        stages.update(stage_seconds(build_trace.take()))
+        record['stages'] = {item: round(value, 3) for item, value in stages.items()}
+        record['peak_memory_mb'] = peak_memory()
+
+        files = [fname for entry in dactyl_manuform.load_manifest().values() for fname in entry['files']]
+        record['artifacts'] = artifact_stats(files)
+        for item in ('bytes', 'faces', 'triangles'):
+            record[item] = total(record['artifacts'], item)
+
+    status, seconds, log_file = run_logged(os.path.join(log_dir, "benchmark_{}.log".format(name)), build)
+    record.setdefault('seconds', round(seconds, 3))
+    record.update(status=status, log=log_file)
+    return record
+
+
+def run_benchmark(jobs):
+    os.makedirs(log_dir, exist_ok=True)
+    records = []
+    for i_job, (name, job) in enumerate(jobs):
+        # The job goes in and its record comes back through a file, see --job.
+        job_file = os.path.join(log_dir, "benchmark_{}.json".format(name))
+        with open(job_file, mode='w') as fid:
+            json.dump({'name': name, 'job': job}, fid)
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), '--job', job_file])
+        if process.returncode == 0:
+            record = load_results(job_file)
+        else:
+            print("{} crashed with exit code {}".format(name, process.returncode))
+            record = {'name': name, 'engine': job['ENGINE'], 'status': 'CRASHED'}
+        os.remove(job_file)
+        records.append(record)
+        print("[{}/{}] {} {} {}s".format(i_job + 1, len(jobs), name, record['status'], record.get('seconds')))
+
+    return {
+        'host': socket.gethostname(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'jobs': {record['name']: record for record in records},
+    }
+
+
+def load_results(fname):
+    with open(fname, mode='r') as fid:
+        return json.load(fid)
+
+
+def save_results(results, fname):
+    with open(fname, mode='w') as fid:
+        json.dump(results, fid, indent=4, sort_keys=True)
+    print("BENCHMARK SAVED TO {}".format(fname))
+
+
+def job_metrics(record):
+    metrics = {item: record.get(item) for item in ('seconds', 'peak_memory_mb', 'bytes', 'faces', 'triangles')}
+    for stage, seconds in record.get('stages', {}).items():
+        metrics['stage:' + stage] = seconds
+    return metrics
+
+
+def compare(results, baseline, threshold=regression_threshold):
+    # Returns the rows of the comparison, (job, metric, baseline, current, change, regressed).
+    rows = []
+    for name, record in sorted(results['jobs'].items()):
+        base = baseline['jobs'].get(name)
+        if base is None:
+            continue
+        if record['status'] != base['status']:
+            rows.append((name, 'status', base['status'], record['status'], None,
+                         base['status'] not in failed_states and record['status'] in failed_states))
+        if record['status'] in failed_states or base['status'] in failed_states:
+            continue
+
+        current = job_metrics(record)
+        for metric, base_value in sorted(job_metrics(base).items()):
+            value = current.get(metric)
+            if base_value is None or value is None:
+                continue
+            if metric.startswith('stage:') and base_value < min_stage_seconds:
+                continue
+            change = (value - base_value) / base_value if base_value else None
+            rows.append((name, metric, base_value, value, change, change is not None and change > threshold))
+    return rows
+
+
+def print_comparison(rows, threshold=regression_threshold):
+    print("{:<24} {:<32} {:>12} {:>12} {:>8}".format('JOB', 'METRIC', 'BASELINE', 'CURRENT', 'CHANGE'))
+    for name, metric, base_value, value, change, regressed in rows:
+        print("{:<24} {:<32} {:>12} {:>12} {:>8} {}".format(
+            name, metric, base_value, value, '' if change is None else "{:+.1%}".format(change),
+            'REGRESSION' if regressed else ''))
+    count = sum(row[-1] for row in rows)
+    print("{} regressions over {:.0%} in {} compared metrics".format(count, threshold, len(rows)))
+    return count
+
+
+if __name__ == '__main__':
+    # --config name and --engine name limit the run, both may be repeated.  --baseline file
+    # compares against another baseline, --threshold 0.1 sets the allowed growth and
+    # --update-baseline stores this run as the baseline.  Exits 1 on regressions.
+    # --job file is how the runner builds one job in a fresh interpreter.
+    opts, args = getopt.getopt(sys.argv[1:], "", [
+        "config=", "engine=", "output=", "baseline=", "threshold=", "update-baseline", "job="
+    ])
+    configs = []
+    engine_names = []
+    output = results_file
+    baseline = baseline_file
+    baseline_given = False
+    threshold = regression_threshold
+    update = False
+    for opt, arg in opts:
+        if opt == '--config':
+            configs.append(arg)
+        elif opt == '--engine':
+            engine_names.append(arg)
+        elif opt == '--output':
+            output = arg
+        elif opt == '--baseline':
+            baseline = arg
+            baseline_given = True
+        elif opt == '--threshold':
+            threshold = float(arg)
+        elif opt == '--update-baseline':
+            update = True
+        elif opt == '--job':
+            item = load_results(arg)
+            with open(arg, mode='w') as fid:
+                json.dump(benchmark_job(item['name'], item['job']), fid)
+            sys.exit(0)
+
+    results = run_benchmark(benchmark_jobs(configs, engine_names))
+    save_results(results, output)
+
+    if update:
+        # A partial run only replaces the jobs it ran.
+        if os.path.isfile(baseline):
+            results = dict(results, jobs=dict(load_results(baseline)['jobs'], **results['jobs']))
+        save_results(results, baseline)
+    elif os.path.isfile(baseline):
+        if print_comparison(compare(results, load_results(baseline), threshold), threshold):
+            sys.exit(1)
+    else:
+        print("NO BASELINE AT {}, COMPARISON SKIPPED. RUN WITH --update-baseline TO STORE ONE".format(baseline))
+        # Asked to compare against a file that is not there.
+        if baseline_given:
+            sys.exit(1)
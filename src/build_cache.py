@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import types
+
+import numpy as np
+
+
+###############################################
+# CONTENT ADDRESSED SUBASSEMBLY CACHE
+###############################################
+# Builder results are stored on disk under a hash of everything the builder
+# can see: the data globals it reads (found by walking its code and every
+# module function it calls), its arguments, the engine and the source/part
+# file version.  Shapes are written with the engine serializers, BRep for
+# cadquery and SCAD text for solid.
+
+
+def builder_inputs(fn, namespace):
+    inputs = {}
+    seen = set()
+    stack = [fn]
+    while stack:
+        item = stack.pop()
+        item = getattr(item, '__wrapped__', item)
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, types.FunctionType):
+            if item.__defaults__:
+                inputs[item.__name__ + '.__defaults__'] = item.__defaults__
+            if item.__kwdefaults__:
+                inputs[item.__name__ + '.__kwdefaults__'] = item.__kwdefaults__
+            for i_cell, cell in enumerate(item.__closure__ or ()):
+                value = getattr(cell.cell_contents, '__wrapped__', cell.cell_contents)
+                if isinstance(value, types.FunctionType) and value.__globals__ is namespace:
+                    stack.append(value)
+                elif not callable(value):
+                    inputs['{}.__closure__[{}]'.format(item.__name__, i_cell)] = value
+            item = item.__code__
+
+        if not isinstance(item, types.CodeType):
+            continue
+
+        for const in item.co_consts:
+            if isinstance(const, types.CodeType):
+                stack.append(const)
+
+        for name in item.co_names:
+            if name not in namespace:
+                continue
+            # Look through decorators (memoized plates, traced builders) to the function itself.
+            value = getattr(namespace[name], '__wrapped__', namespace[name])
+            if isinstance(value, types.FunctionType):
+                if value.__globals__ is namespace:
+                    stack.append(value)
+            elif not (callable(value) or isinstance(value, types.ModuleType)):
+                inputs[name] = value
+
+    return inputs
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return repr(value)
+
+
+def source_version(files):
+    digest = hashlib.sha256()
+    for fname in files:
+        digest.update(os.path.basename(fname).encode('utf-8'))
+        with open(fname, mode='rb') as fid:
+            digest.update(fid.read())
+    return digest.hexdigest()
+
+
+def builder_key(fn, namespace, args=(), kwargs=None, engine=None, version=None):
+    data = {
+        'builder': fn.__name__,
+        'args': args,
+        'kwargs': kwargs or {},
+        'inputs': builder_inputs(fn, namespace),
+        'engine': engine,
+        'version': version,
+    }
+    text = json.dumps(data, sort_keys=True, default=_jsonable)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def combine_keys(keys):
+    return hashlib.sha256(" ".join(sorted(keys)).encode('utf-8')).hexdigest()
+
+
+def cache_file(cache_dir, name, key, ext):
+    return os.path.join(cache_dir, "{}_{}.{}".format(name, key[:32], ext))
+
+
+def load_or_build(cache_dir, name, key, build, serialize, deserialize, ext):
+    fname = cache_file(cache_dir, name, key, ext)
+    if os.path.isfile(fname):
+        print("LOADING {} FROM CACHE {}".format(name, fname))
+        with open(fname, mode='rb') as fid:
+            return deserialize(fid.read())
+
+    shape = build()
+    if shape is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write then rename so parallel builders never see a partial entry.
+        temp_name = "{}.{}.tmp".format(fname, os.getpid())
+        with open(temp_name, mode='wb') as fid:
+            fid.write(serialize(shape))
+        os.replace(temp_name, fname)
+    return shape
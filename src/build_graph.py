@@ -0,0 +1,176 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import build_trace
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+###############################################
+# SUBASSEMBLY BUILD GRAPH
+###############################################
+# Each node is a builder function plus the names of the nodes it consumes.
+# Independent nodes are evaluated side by side in a process pool, a node is
+# only started once all of its inputs exist.  Results cross the process
+# boundary through the engine serializers (BRep for cadquery, SCAD text for
+# solid), so the engine helpers stay the only place that knows about shapes.
+#
+# Workers are forked so they inherit the configured dactyl_manuform module,
+# node functions may therefore be lambdas or closures.  Without fork support
+# (Windows, macOS spawn) or when already inside a worker the graph runs
+# serially in the calling process.
+#
+# The pool never has more workers than nodes.  A worker address space limit
+# is opt-in: RLIMIT_AS caps virtual size, which a forked worker already has
+# plenty of once cadquery is imported, so no default share would be safe.
+
+
+_active_graph = None
+
+
+class BuildNode:
+    def __init__(self, name, fn, inputs=(), kwargs=None):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.kwargs = kwargs if kwargs is not None else {}
+
+
+class BuildGraph:
+    def __init__(self, workers=1, serialize=None, deserialize=None, memory_limit=None):
+        self.workers = workers
+        self.serialize = serialize
+        self.deserialize = deserialize
+        self.memory_limit = memory_limit
+        self.nodes = {}
+
+    def add(self, name, fn, inputs=(), **kwargs):
+        if name in self.nodes:
+            raise ValueError("Duplicate build node: {}".format(name))
+        for item in inputs:
+            if item not in self.nodes:
+                raise ValueError("Build node {} needs {} which is not defined yet".format(name, item))
+        self.nodes[name] = BuildNode(name, fn, inputs, kwargs)
+
+    def merge(self, other, prefix, links=None):
+        # Copies the nodes of another graph under prefix.  Nodes named in links are not
+        # copied, the node links maps them to stands in for them.
+        links = dict(links or {})
+        names = {}
+        for name, node in other.nodes.items():
+            if name in links:
+                names[name] = links[name]
+            else:
+                names[name] = prefix + name
+                self.add(names[name], node.fn, [names[item] for item in node.inputs], **node.kwargs)
+        return names
+
+    def subgraph(self, names):
+        # The named nodes with every node they are built from.
+        needed = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.nodes[name].inputs)
+        graph = BuildGraph(self.workers, self.serialize, self.deserialize, self.memory_limit)
+        for name, node in self.nodes.items():
+            if name in needed:
+                graph.add(name, node.fn, node.inputs, **node.kwargs)
+        return graph
+
+    def pack(self, value):
+        # Shapes go through the serializers, None and text (file names) pass as they are.
+        if value is None or self.serialize is None or isinstance(value, str):
+            return value
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.pack(item) for item in value)
+        return self.serialize(value)
+
+    def unpack(self, value):
+        if value is None or self.deserialize is None or isinstance(value, str):
+            return value
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.unpack(item) for item in value)
+        return self.deserialize(value)
+
+    def evaluate(self, name, inputs):
+        node = self.nodes[name]
+        with build_trace.span(name, cat='graph'):
+            return node.fn(*inputs, **node.kwargs)
+
+    def worker_count(self):
+        if self.workers is not None:
+            return self.workers
+        return max(1, min(os.cpu_count() or 1, len(self.nodes)))
+
+    def parallel(self):
+        if self.workers is not None and self.workers <= 1:
+            return False
+        if multiprocessing.parent_process() is not None:
+            return False
+        return 'fork' in multiprocessing.get_all_start_methods()
+
+    def run(self, done=None):
+        # done holds results that already exist, those nodes are taken as they are.
+        done = dict(done or {})
+        if self.parallel() and len(done) < len(self.nodes):
+            return self._run_pool(done)
+        return self._run_serial(done)
+
+    def _run_serial(self, done):
+        results = {}
+        for name, node in self.nodes.items():
+            if name in done:
+                results[name] = done[name]
+            else:
+                results[name] = self.evaluate(name, [results[item] for item in node.inputs])
+        return results
+
+    def _run_pool(self, done):
+        global _active_graph
+        _active_graph = self
+        pending = {name: node for name, node in self.nodes.items() if name not in done}
+        needed = set(item for node in pending.values() for item in node.inputs)
+        packed = {name: self.pack(value) for name, value in done.items() if name in needed}
+        running = {}
+        context = multiprocessing.get_context('fork')
+        try:
+            with ProcessPoolExecutor(max_workers=self.worker_count(), mp_context=context,
+                                     initializer=limit_memory, initargs=(self.memory_limit,)) as pool:
+                while pending or running:
+                    for name, node in list(pending.items()):
+                        if all(item in packed for item in node.inputs):
+                            inputs = [packed[item] for item in node.inputs]
+                            running[pool.submit(_run_node, name, inputs)] = name
+                            del pending[name]
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        packed[running.pop(future)], events = future.result()
+                        build_trace.extend(events)
+        finally:
+            _active_graph = None
+
+        return {name: done[name] if name in done else self.unpack(packed[name]) for name in self.nodes}
+
+
+def limit_memory(limit):
+    if limit is None or resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _run_node(name, inputs):
+    # The spans recorded by the worker go back with the result, not those it inherited.
+    graph = _active_graph
+    build_trace.reset()
+    result = graph.pack(graph.evaluate(name, graph.unpack(inputs)))
+    return result, build_trace.take()
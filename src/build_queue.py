@@ -0,0 +1,233 @@
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+
+###############################################
+# DIRECTORY BACKED BUILD QUEUE
+###############################################
+# Jobs are JSON files in a shared directory, an NFS mount for several build
+# boxes or any local directory for one, so no broker service is involved.
+#
+#   pending/<name>.json   waiting, highest priority then oldest first
+#   running/<name>.json   claimed by renaming it out of pending, whoever wins
+#                         the rename owns the job
+#   done/<name>.json      result record of a finished job
+#   failed/<name>.json    result record of a job out of attempts
+#
+# The owner touches its running file every heartbeat seconds.  A running file
+# older than the lease belongs to a dead worker and is put back in pending, as
+# is a job whose build process died, until the job has used up its attempts.
+# Every claim carries a token, a worker whose job was reaped and claimed again
+# finds another token in the running file and stops without publishing.
+# Ages are measured against the mtime of a file the reaper writes itself, so
+# worker clocks need not agree.
+
+
+class BuildQueue:
+    def __init__(self, path, lease=600, heartbeat=60, attempts=3):
+        self.path = path
+        self.lease = lease
+        self.heartbeat = heartbeat
+        self.attempts = attempts
+        for item in ('pending', 'running', 'done', 'failed'):
+            os.makedirs(os.path.join(path, item), exist_ok=True)
+
+    def file(self, state, name):
+        return os.path.join(self.path, state, name + '.json')
+
+    def write(self, fname, data):
+        # Write then rename so nobody reads a partial file.
+        temp_name = "{}.{}.{}.tmp".format(fname, socket.gethostname(), os.getpid())
+        with open(temp_name, mode='w') as fid:
+            json.dump(data, fid, indent=4)
+        os.replace(temp_name, fname)
+
+    def read(self, fname):
+        with open(fname, mode='r') as fid:
+            return json.load(fid)
+
+    def names(self, state):
+        folder = os.path.join(self.path, state)
+        items = []
+        for fname in os.listdir(folder):
+            if fname.endswith('.json'):
+                try:
+                    items.append((os.stat(os.path.join(folder, fname)).st_mtime, fname[:-len('.json')]))
+                except FileNotFoundError:
+                    pass
+        return [name for mtime, name in sorted(items)]
+
+    def submit(self, name, job, priority=0):
+        # A job that is already waiting or running is left alone, a finished one is queued again.
+        # Higher priority jobs are claimed first, file times are too coarse to order a batch.
+        if os.path.exists(self.file('pending', name)) or os.path.exists(self.file('running', name)):
+            print("QUEUE: {} IS ALREADY QUEUED".format(name))
+            return False
+        for state in ('done', 'failed'):
+            if os.path.exists(self.file(state, name)):
+                os.remove(self.file(state, name))
+        self.write(self.file('pending', name), {'name': name, 'attempt': 0, 'priority': priority, 'job': job})
+        return True
+
+    def queued(self):
+        # Pending jobs by priority, then oldest first.
+        items = []
+        for name in self.names('pending'):
+            try:
+                items.append((-self.read(self.file('pending', name)).get('priority', 0), name))
+            except (FileNotFoundError, ValueError):
+                pass
+        return [name for priority, name in sorted(items, key=lambda item: item[0])]
+
+    def claim(self):
+        for name in self.queued():
+            pending = self.file('pending', name)
+            try:
+                # Fresh mtime first, the reaper must not take the claim for an expired lease.
+                os.utime(pending)
+                os.rename(pending, self.file('running', name))
+            except FileNotFoundError:
+                continue
+            entry = self.read(self.file('running', name))
+            entry['attempt'] += 1
+            entry['host'] = "{}:{}".format(socket.gethostname(), os.getpid())
+            # Tells this claim from a later one on the same job, after a reap.
+            entry['token'] = "{}:{}/{}".format(entry['host'], threading.get_ident(), entry['attempt'])
+            self.write(self.file('running', name), entry)
+            return entry
+        return None
+
+    def owns(self, entry):
+        try:
+            return self.read(self.file('running', entry['name'])).get('token') == entry['token']
+        except (FileNotFoundError, ValueError):
+            return False
+
+    def renew(self, entry):
+        # False once the job was reaped, it may be running again elsewhere.
+        if not self.owns(entry):
+            return False
+        try:
+            os.utime(self.file('running', entry['name']))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def finish(self, entry, result):
+        # Only the current owner publishes, a worker that lost its claim drops the result.
+        if not self.owns(entry):
+            print("QUEUE: {} WAS CLAIMED AGAIN, RESULT DISCARDED".format(entry['name']))
+            return
+        self.publish(entry, result, self.file('running', entry['name']))
+
+    def publish(self, entry, result, source):
+        # Moves the job out of source, the running file or the reaper's copy of it.
+        status = result[0] if result is not None else 'CRASHED'
+        record = dict(entry, status=status)
+        if result is not None:
+            record['seconds'], record['log'] = result[1], result[2]
+
+        # A build that fails fails again, only jobs whose worker died are retried.
+        if status == 'CRASHED' and entry['attempt'] < self.attempts:
+            print("QUEUE: {} {} ON ATTEMPT {}, RETRYING".format(entry['name'], status, entry['attempt']))
+            # Rewritten in place and renamed, so it is never in pending and running at once.
+            self.write(source, dict(entry, last=status))
+            os.rename(source, self.file('pending', entry['name']))
+        else:
+            self.write(self.file('failed' if status in ('FAILED', 'CRASHED') else 'done', entry['name']), record)
+            os.remove(source)
+
+    def clock(self):
+        fname = os.path.join(self.path, 'clock')
+        with open(fname, mode='w') as fid:
+            fid.write(socket.gethostname())
+        return os.stat(fname).st_mtime
+
+    def reap(self):
+        now = self.clock()
+        for name in self.names('running'):
+            running = self.file('running', name)
+            reaping = "{}.{}.{}.reap".format(running, socket.gethostname(), os.getpid())
+            try:
+                if now - os.stat(running).st_mtime < self.lease:
+                    continue
+                # Only one reaper wins this rename.
+                os.rename(running, reaping)
+            except FileNotFoundError:
+                continue
+            entry = self.read(reaping)
+            print("QUEUE: LEASE OF {} ON {} EXPIRED".format(name, entry.get('host')))
+            # The rename made the reaper the owner.
+            self.publish(dict(entry), None, reaping)
+
+    def drained(self):
+        return not self.names('pending') and not self.names('running')
+
+    def work(self, build, wait=False, poll=10, memory=None, initializer=None):
+        # Claims and builds jobs until the queue is drained, or forever with wait.
+        # build(job) returns (status, seconds, log_file) and runs in a child process,
+        # so this process keeps the lease alive and notices when the build dies.
+        while True:
+            self.reap()
+            entry = self.claim()
+            if entry is None:
+                if not wait and self.drained():
+                    return
+                time.sleep(poll)
+                continue
+
+            print("QUEUE: BUILDING {} (ATTEMPT {})".format(entry['name'], entry['attempt']))
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_run_build, args=(sender, build, entry['job'], initializer, memory))
+            process.start()
+            sender.close()
+            message = None
+            lost = False
+            try:
+                while not receiver.poll(self.heartbeat):
+                    if not self.renew(entry):
+                        # Another worker builds it now, stop before both write the same outputs.
+                        print("QUEUE: {} LOST ITS CLAIM, STOPPING THE BUILD".format(entry['name']))
+                        process.terminate()
+                        lost = True
+                        break
+                if not lost:
+                    try:
+                        message = receiver.recv()
+                    except EOFError:
+                        # The build process died without a word, usually killed for memory.
+                        pass
+            finally:
+                receiver.close()
+                process.join()
+            if lost:
+                continue
+
+            result = None
+            if message is None:
+                print("QUEUE: {} CRASHED: EXIT CODE {}".format(entry['name'], process.exitcode))
+            elif message[0] == 'error':
+                print("QUEUE: {} CRASHED: {}".format(entry['name'], message[1]))
+            else:
+                result = message[1]
+            print("QUEUE: {} {}".format(entry['name'], result[0] if result is not None else 'CRASHED'))
+            self.finish(entry, result)
+
+    def status(self):
+        return {state: self.names(state) for state in ('pending', 'running', 'done', 'failed')}
+
+
+def _run_build(sender, build, job, initializer=None, memory=None):
+    # Body of the build process, sends back ('done', result) or ('error', description).
+    if initializer is not None:
+        initializer(memory)
+    try:
+        message = ('done', build(job))
+    except Exception as err:
+        message = ('error', repr(err))
+    sender.send(message)
+    sender.close()
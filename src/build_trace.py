@@ -0,0 +1,91 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+###############################################
+# BUILD TRACE
+###############################################
+# Nested spans with wall time and arguments for the builders and the engine
+# helpers, saved as Chrome trace JSON (open in chrome://tracing or Perfetto).
+# Tracing is off unless enabled is set, a traced call then costs one check.
+# Spans recorded in build graph workers travel back with the node results, so
+# every worker shows up as its own process in the timeline.
+
+enabled = False
+
+_events = []
+
+
+def reset():
+    del _events[:]
+
+
+def take():
+    # Hands over the events recorded so far, a worker returns them with its result.
+    events = list(_events)
+    reset()
+    return events
+
+
+def extend(events):
+    _events.extend(events)
+
+
+def describe(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return "{}[{}]".format(type(value).__name__, len(value))
+    return type(value).__name__
+
+
+@contextmanager
+def span(name, cat='build', args=None):
+    # args are the span arguments shown in the timeline, any names will do.
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _events.append({
+            'name': name,
+            'cat': cat,
+            'ph': 'X',
+            'ts': start * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': {item: describe(value) for item, value in (args or {}).items()},
+        })
+
+
+def traced(fn):
+    # Records a span per call, named after the function and tagged with its module file,
+    # which stays the same when the module runs as a script.
+    cat = os.path.splitext(os.path.basename(fn.__code__.co_filename))[0]
+
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        if not enabled:
+            return fn(*args, **kwargs)
+        items = {'arg{}'.format(i_arg): value for i_arg, value in enumerate(args)}
+        items.update(kwargs)
+        with span(fn.__name__, cat, items):
+            return fn(*args, **kwargs)
+    return call
+
+
+def save(fname):
+    # perf_counter has no fixed origin, the timeline starts at the first event.
+    origin = min((event['ts'] for event in _events), default=0)
+    events = [dict(event, ts=event['ts'] - origin) for event in _events]
+    with open(fname, mode='w') as fid:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fid)
+    print("TRACE SAVED TO {} ({} spans)".format(fname, len(events)))
@@ -5,9 +5,17 @@ import getopt, sys
 import json
 import os
 import copy
+import functools
 
 from scipy.spatial import ConvexHull as sphull
 
+from build_graph import BuildGraph
+from build_queue import BuildQueue
+from build_trace import traced
+import build_trace
+import build_cache
+from transforms import translation_matrix, rotation_matrix_x, rotation_matrix_y
+
 def deg2rad(degrees: float) -> float:
     return degrees * pi / 180
 
@@ -17,155 +25,292 @@ def rad2deg(rad: float) -> float:
 
 
 ###############################################
-# EXTREMELY UGLY BUT FUNCTIONAL BOOTSTRAP
+# CONFIGURATION
 ###############################################
+# Every builder reads its settings from the module globals.  configure() binds
+# a generate_configuration.Config, the engine helpers and every value derived
+# from them, it can be called again to build another configuration in the same
+# process without reloading the module.
 
-## IMPORT DEFAULT CONFIG IN CASE NEW PARAMETERS EXIST
 import generate_configuration as cfg
-for item in cfg.shape_config:
-    locals()[item] = cfg.shape_config[item]
-
-if len(sys.argv) <= 1:
-    print("NO CONFIGURATION SPECIFIED, USING run_config.json")
-    with open(os.path.join(r".", 'run_config.json'), mode='r') as fid:
-        data = json.load(fid)
-
-else:
-    ## CHECK FOR CONFIG FILE AND WRITE TO ANY VARIABLES IN FILE.
-    opts, args = getopt.getopt(sys.argv[1:], "", ["config="])
-    for opt, arg in opts:
-        if opt in ('--config'):
-            with open(os.path.join(r"..", "configs", arg + '.json'), mode='r') as fid:
-                data = json.load(fid)
 
-for item in data:
-    locals()[item] = data[item]
-
-
-# Really rough setup.  Check for ENGINE, set it not present from configuration.
-try:
-    print('Found Current Engine in Config = {}'.format(ENGINE))
-except Exception:
-    print('Engine Not Found in Config')
-    ENGINE = 'solid'
-    # ENGINE = 'cadquery'
-    print('Setting Current Engine = {}'.format(ENGINE))
-
-if save_dir in ['', None, '.']:
-    save_path = path.join(r"..", "things")
-    parts_path = path.join(r"..", "src", "parts")
-else:
-    save_path = path.join(r"..", "things", save_dir)
-    parts_path = path.join(r"..", r"..", "src", "parts")
+teensy_width = 20
+teensy_height = 12
+teensy_length = 33
+teensy2_length = 53
+teensy_pcb_thickness = 2
+teensy_offset_height = 5
+teensy_holder_top_length = 18
+teensy_holder_width = 7 + teensy_pcb_thickness
+teensy_holder_height = 6 + teensy_width
 
-###############################################
-# END EXTREMELY UGLY BOOTSTRAP
-###############################################
+# Names defined by this module, set at the bottom.  Engine helpers never replace them.
+_module_names = None
+_engine_names = set()
+# Values the OLED block of the last configure() replaced, put back by the next one.
+# Names the module did not have before are saved as _unset.
+_oled_saved = {}
+_unset = object()
+
+
+def use_engine(engine):
+    # Binds the helpers of one engine like a star import would.
+    global helpers_file
+    if engine == 'cadquery':
+        import helpers_cadquery as helpers
+        helpers.default_union_strategy = union_strategy
+        helpers_file = 'helpers_cadquery.py'
+    else:
+        import helpers_solid as helpers
+        helpers_file = 'helpers_solid.py'
+
+    for name in _engine_names:
+        globals().pop(name, None)
+    _engine_names.clear()
+    for name, value in vars(helpers).items():
+        if not name.startswith('_') and name not in _module_names:
+            globals()[name] = value
+            _engine_names.add(name)
+
+
+def configure(config):
+    global save_path, parts_path, _source_version
+    global column_style, centerrow, lastrow, cornerrow, lastcol
+    global keyswitch_height, keyswitch_width, symmetry, plate_file, plate_offset
+    global mount_width, mount_height, mount_thickness, double_plate_height
+    global left_wall_x_offset, left_wall_z_offset, left_wall_lower_y_offset, left_wall_lower_z_offset
+    global cap_top_height, row_radius, column_radius, column_x_delta, column_base_angle, key_transforms
+    global rj9_start, rj9_position, usb_holder_position, external_start
+    global pcb_mount_ref_position, pcb_holder_position, pcb_holder_thickness, pcb_screw_position
+    global oled_mount_location_xyz, oled_mount_rotation_xyz
+
+    for name, value in _oled_saved.items():
+        if value is _unset:
+            globals().pop(name, None)
+        else:
+            globals()[name] = value
+    _oled_saved.clear()
 
-####################################################
-# HELPER FUNCTIONS TO MERGE CADQUERY AND OPENSCAD
-####################################################
+    globals().update(config.as_dict())
+    build_trace.enabled = trace_file not in [None, '']
+    use_engine(ENGINE)
+    _source_version = None
 
-if ENGINE == 'cadquery':
-    from helpers_cadquery import *
-else:
-    from helpers_solid import *
+    if save_dir in ['', None, '.']:
+        save_path = path.join(r"..", "things")
+        parts_path = path.join(r"..", "src", "parts")
+    else:
+        save_path = path.join(r"..", "things", save_dir)
+        parts_path = path.join(r"..", r"..", "src", "parts")
+    if ENGINE == 'cadquery':
+        # Solid writes the part paths into the SCAD files, relative to save_path.  Cadquery
+        # reads the parts itself, relative to the working directory.
+        parts_path = path.relpath(path.join(path.dirname(path.abspath(__file__)), "parts"))
 
-####################################################
-# END HELPER FUNCTIONS
-####################################################
+    if oled_mount_type is not None and oled_mount_type != "NONE":
+        oled = copy.deepcopy(oled_configurations[oled_mount_type])
+        _oled_saved.update({name: globals().get(name, _unset) for name in oled})
+        globals().update(oled)
 
+    if nrows > 5:
+        column_style = column_style_gt5
 
-debug_exports = False 
-debug_trace = False
+    centerrow = nrows - centerrow_offset
 
-def debugprint(info):
-    if debug_trace:
-        print(info)
+    lastrow = nrows - 1
+    if reduced_outer_cols>0 or reduced_inner_cols>0:
+        cornerrow = lastrow - 1
+    else:
+        cornerrow = lastrow
+    lastcol = ncols - 1
 
 
-if oled_mount_type is not None and oled_mount_type != "NONE":
-    for item in oled_configurations[oled_mount_type]:
-        locals()[item] = oled_configurations[oled_mount_type][item]
+    # Derived values
+    if plate_style in ['NUB', 'HS_NUB']:
+        keyswitch_height = nub_keyswitch_height
+        keyswitch_width = nub_keyswitch_width
+    elif plate_style in ['UNDERCUT', 'HS_UNDERCUT', 'NOTCH', 'HS_NOTCH']:
+        keyswitch_height = undercut_keyswitch_height
+        keyswitch_width = undercut_keyswitch_width
+    else:
+        keyswitch_height = hole_keyswitch_height
+        keyswitch_width = hole_keyswitch_width
 
-if nrows > 5:
-    column_style = column_style_gt5
+    if 'HS_' in plate_style:
+        symmetry = "asymmetric"
+        plate_file = path.join(parts_path, r"hot_swap_plate")
+        plate_offset = 0.0
 
-centerrow = nrows - centerrow_offset
+    if (trackball_in_wall or ('TRACKBALL' in thumb_style)) and not ball_side == 'both':
+        symmetry = "asymmetric"
 
-lastrow = nrows - 1
-if reduced_outer_cols>0 or reduced_inner_cols>0:
-    cornerrow = lastrow - 1
-else:
-    cornerrow = lastrow
-lastcol = ncols - 1
+    mount_width = keyswitch_width + 2 * plate_rim
+    mount_height = keyswitch_height + 2 * plate_rim
+    mount_thickness = plate_thickness
 
+    if default_1U_cluster and thumb_style=='DEFAULT':
+        double_plate_height = (.7*sa_double_length - mount_height) / 3
+    elif thumb_style=='DEFAULT':
+        double_plate_height = (.95*sa_double_length - mount_height) / 3
+    else:
+        double_plate_height = (sa_double_length - mount_height) / 3
+
+    if oled_mount_type is not None and oled_mount_type != "NONE":
+        left_wall_x_offset = oled_left_wall_x_offset_override
+        left_wall_z_offset = oled_left_wall_z_offset_override
+        left_wall_lower_y_offset = oled_left_wall_lower_y_offset
+        left_wall_lower_z_offset = oled_left_wall_lower_z_offset
+
+    cap_top_height = plate_thickness + sa_profile_key_height
+    row_radius = ((mount_height + extra_height) / 2) / (np.sin(alpha / 2)) + cap_top_height
+    column_radius = (
+                            ((mount_width + extra_width) / 2) / (np.sin(beta / 2))
+                    ) + cap_top_height
+    column_x_delta = -1 - column_radius * np.sin(beta)
+    column_base_angle = beta * (centercol - 2)
+
+    key_transforms = key_transform_table()
+
+    rj9_start = list(
+        np.array([0, -3, 0])
+        + np.array(
+            key_position(
+                list(np.array(wall_locate3(0, 1)) + np.array([0, (mount_height / 2), 0])),
+                0,
+                0,
+            )
+        )
+    )
+    rj9_position = (rj9_start[0], rj9_start[1], 11)
 
-# Derived values
-if plate_style in ['NUB', 'HS_NUB']:
-    keyswitch_height = nub_keyswitch_height
-    keyswitch_width = nub_keyswitch_width
-elif plate_style in ['UNDERCUT', 'HS_UNDERCUT', 'NOTCH', 'HS_NOTCH']:
-    keyswitch_height = undercut_keyswitch_height
-    keyswitch_width = undercut_keyswitch_width
-else:
-    keyswitch_height = hole_keyswitch_height
-    keyswitch_width = hole_keyswitch_width
+    usb_holder_position = key_position(
+        list(np.array(wall_locate2(0, 1)) + np.array([0, (mount_height / 2), 0])), 1, 0
+    )
 
-if 'HS_' in plate_style:
-    symmetry = "asymmetric"
-    plate_file = path.join(parts_path, r"hot_swap_plate")
-    plate_offset = 0.0
+    external_start = list(
+        # np.array([0, -3, 0])
+        np.array([external_holder_width / 2, 0, 0])
+        + np.array(
+            key_position(
+                list(np.array(wall_locate3(0, 1)) + np.array([0, (mount_height / 2), 0])),
+                0,
+                0,
+            )
+        )
+    )
 
-if (trackball_in_wall or ('TRACKBALL' in thumb_style)) and not ball_side == 'both':
-    symmetry = "asymmetric"
+    pcb_mount_ref_position = key_position(
+        #TRRS POSITION IS REFERENCE BY CONVENIENCE
+        list(np.array(wall_locate3(0, 1)) + np.array([0, (mount_height / 2), 0])), 0, 0
+    )
+    pcb_mount_ref_position[0] = pcb_mount_ref_position[0] + pcb_mount_ref_offset[0]
+    pcb_mount_ref_position[1] = pcb_mount_ref_position[1] + pcb_mount_ref_offset[1]
+    pcb_mount_ref_position[2] = 0.0 + pcb_mount_ref_offset[2]
+
+    pcb_holder_position = copy.deepcopy(pcb_mount_ref_position)
+    pcb_holder_position[0] = pcb_holder_position[0] + pcb_holder_offset[0]
+    pcb_holder_position[1] = pcb_holder_position[1] + pcb_holder_offset[1]
+    pcb_holder_position[2] = pcb_holder_position[2] + pcb_holder_offset[2]
+    pcb_holder_thickness = pcb_holder_size[2]
+
+    pcb_screw_position = copy.deepcopy(pcb_mount_ref_position)
+    pcb_screw_position[1] = pcb_screw_position[1] + pcb_screw_y_offset
+
+    if oled_center_row is not None:
+        base_pt1, base_pt2, base_pt0 = key_positions(
+            [-mount_width / 2, mount_height / 2, 0], 0, [oled_center_row - 1, oled_center_row + 1, oled_center_row]
+        )
 
-mount_width = keyswitch_width + 2 * plate_rim
-mount_height = keyswitch_height + 2 * plate_rim
-mount_thickness = plate_thickness
+        oled_mount_location_xyz = (np.array(base_pt1)+np.array(base_pt2))/2. + np.array(((-left_wall_x_offset/2), 0, 0)) + np.array(oled_translation_offset)
+        oled_mount_location_xyz[2] = (oled_mount_location_xyz[2] + base_pt0[2])/2
 
-if default_1U_cluster and thumb_style=='DEFAULT':
-    double_plate_height = (.7*sa_double_length - mount_height) / 3
-elif thumb_style=='DEFAULT':
-    double_plate_height = (.95*sa_double_length - mount_height) / 3
-else:
-    double_plate_height = (sa_double_length - mount_height) / 3
+        angle_x = np.arctan2(base_pt1[2] - base_pt2[2], base_pt1[1] - base_pt2[1])
+        angle_z = np.arctan2(base_pt1[0] - base_pt2[0], base_pt1[1] - base_pt2[1])
 
+        oled_mount_rotation_xyz = (rad2deg(angle_x), 0, -rad2deg(angle_z)) + np.array(oled_rotation_offset)
 
+    # Plates are memoized per plate style only, any other setting may change them.
+    single_plate.cache_clear()
+    adjustable_plate.cache_clear()
 
-if oled_mount_type is not None and oled_mount_type != "NONE":
-    left_wall_x_offset = oled_left_wall_x_offset_override
-    left_wall_z_offset = oled_left_wall_z_offset_override
-    left_wall_lower_y_offset = oled_left_wall_lower_y_offset
-    left_wall_lower_z_offset = oled_left_wall_lower_z_offset
+    # save_path = path.join("..", "things", save_dir)
+    if not path.isdir(save_path):
+        os.mkdir(save_path)
 
 
+debug_exports = False 
+_source_version = None
+
+def source_version():
+    global _source_version
+    if _source_version is None:
+        src_dir = path.dirname(path.abspath(__file__))
+        part_dir = path.join(src_dir, "parts")
+        files = [path.join(src_dir, item) for item in ("dactyl_manuform.py", helpers_file, "transforms.py")]
+        files.extend(
+            path.join(part_dir, fname) for fname in sorted(os.listdir(part_dir)) if not fname.endswith('.brep')
+        )
+        _source_version = build_cache.source_version(files)
+    return _source_version
 
-cap_top_height = plate_thickness + sa_profile_key_height
-row_radius = ((mount_height + extra_height) / 2) / (np.sin(alpha / 2)) + cap_top_height
-column_radius = (
-                        ((mount_width + extra_width) / 2) / (np.sin(beta / 2))
-                ) + cap_top_height
-column_x_delta = -1 - column_radius * np.sin(beta)
-column_base_angle = beta * (centercol - 2)
 
+def cache_key(fn, args, kwargs):
+    # The build context only carries inputs that are already built, it is not part of the key.
+    key_kwargs = {name: value for name, value in kwargs.items() if name != 'context'}
+    return build_cache.builder_key(fn, globals(), args, key_kwargs, engine=ENGINE, version=source_version())
 
 
+def cached(fn):
+    # Wraps an expensive builder so unchanged results load from build_cache_dir.
+    @functools.wraps(fn)
+    def build(*args, **kwargs):
+        if build_cache_dir in [None, '']:
+            return fn(*args, **kwargs)
+        return build_cache.load_or_build(
+            build_cache_dir, fn.__name__, cache_key(fn, args, kwargs), (lambda: fn(*args, **kwargs)),
+            serialize_shape, deserialize_shape, serialized_extension,
+        )
+    build.builder = fn
+    return build
+
+
+def cached_nodes(graph):
+    # Cache file of every cached node without inputs, the release planner builds each file once.
+    files = {}
+    for name, node in graph.nodes.items():
+        builder = getattr(node.fn, 'builder', None)
+        if builder is not None and not node.inputs:
+            key = cache_key(builder, (), node.kwargs)
+            files[name] = build_cache.cache_file(build_cache_dir, builder.__name__, key, serialized_extension)
+    return files
+
+
+def shared(context, fn, **kwargs):
+    # Subassembly shared between build stages, model_side fills the context for baseplate.
+    if context is None:
+        return fn(**kwargs)
+    key = (fn.__name__, tuple(sorted(kwargs.items())))
+    code = getattr(fn, '__wrapped__', fn).__code__
+    if key not in context:
+        if 'context' in code.co_varnames[:code.co_argcount]:
+            context[key] = fn(context=context, **kwargs)
+        else:
+            context[key] = fn(**kwargs)
+    return context[key]
 
-teensy_width = 20
-teensy_height = 12
-teensy_length = 33
-teensy2_length = 53
-teensy_pcb_thickness = 2
-teensy_offset_height = 5
-teensy_holder_top_length = 18
-teensy_holder_width = 7 + teensy_pcb_thickness
-teensy_holder_height = 6 + teensy_width
 
+def memoized(fn):
+    # Builds a plate once per plate style and arguments, callers place it by transform only.
+    shapes = {}
 
-# save_path = path.join("..", "things", save_dir)
-if not path.isdir(save_path):
-    os.mkdir(save_path)
+    @functools.wraps(fn)
+    def build(*args, **kwargs):
+        key = (plate_style, args, tuple(sorted(kwargs.items())))
+        if key not in shapes:
+            shapes[key] = fn(*args, **kwargs)
+        return shapes[key]
+    build.cache_clear = shapes.clear
+    return build
 
 
 def column_offset(column: int) -> list:
@@ -174,6 +319,7 @@ def column_offset(column: int) -> list:
 # column_style='fixed'
 
 
+@memoized
 def single_plate(cylinder_segments=100, side="right"):
 
     if plate_style in ['NUB', 'HS_NUB']:
@@ -438,32 +584,6 @@ def key_pcb():
 #########################
 
 
-def rotate_around_x(position, angle):
-    # debugprint('rotate_around_x()')
-    t_matrix = np.array(
-        [
-            [1, 0, 0],
-            [0, np.cos(angle), -np.sin(angle)],
-            [0, np.sin(angle), np.cos(angle)],
-        ]
-    )
-    return np.matmul(t_matrix, position)
-
-
-def rotate_around_y(position, angle):
-    # debugprint('rotate_around_y()')
-    t_matrix = np.array(
-        [
-            [np.cos(angle), 0, np.sin(angle)],
-            [0, 1, 0],
-            [-np.sin(angle), 0, np.cos(angle)],
-        ]
-    )
-    return np.matmul(t_matrix, position)
-
-
-
-
 def apply_key_geometry(
         shape,
         translate_fn,
@@ -471,10 +591,8 @@ def apply_key_geometry(
         rotate_y_fn,
         column,
         row,
-        column_style=column_style,
 ):
 
-    debugprint('apply_key_geometry()')
 
     column_angle = beta * (centercol - column)
 
@@ -513,38 +631,60 @@ def apply_key_geometry(
     return shape
 
 
-def x_rot(shape, angle):
-    # debugprint('x_rot()')
-    return rotate(shape, [rad2deg(angle), 0, 0])
+def key_place(shape, column, row):
+    return transform(shape, key_transform(column, row))
 
 
-def y_rot(shape, angle):
-    # debugprint('y_rot()')
-    return rotate(shape, [0, rad2deg(angle), 0])
+def matrix_translate(matrix, vector):
+    return np.matmul(translation_matrix(vector), matrix)
 
 
-def key_place(shape, column, row):
-    debugprint('key_place()')
-    return apply_key_geometry(shape, translate, x_rot, y_rot, column, row)
+def matrix_rotate_x(matrix, angle):
+    return np.matmul(rotation_matrix_x(angle), matrix)
+
 
+def matrix_rotate_y(matrix, angle):
+    return np.matmul(rotation_matrix_y(angle), matrix)
 
-def add_translate(shape, xyz):
-    debugprint('add_translate()')
-    vals = []
-    for i in range(len(shape)):
-        vals.append(shape[i] + xyz[i])
-    return vals
+
+def key_transform_table():
+    # 4x4 homogeneous placement of every (column, row), whatever the column style.
+    table = np.empty((ncols, nrows, 4, 4))
+    for column in range(ncols):
+        for row in range(nrows):
+            table[column, row] = apply_key_geometry(
+                np.identity(4), matrix_translate, matrix_rotate_x, matrix_rotate_y, column, row
+            )
+    return table
+
+
+def key_transform(column, row):
+    if column in range(ncols) and row in range(nrows):
+        return key_transforms[int(column), int(row)]
+    return apply_key_geometry(np.identity(4), matrix_translate, matrix_rotate_x, matrix_rotate_y, column, row)
 
 
 def key_position(position, column, row):
-    debugprint('key_position()')
-    return apply_key_geometry(
-        position, add_translate, rotate_around_x, rotate_around_y, column, row
-    )
+    return list(np.matmul(key_transform(column, row), [*position[:3], 1])[:3])
+
+
+def key_positions(positions, columns, rows):
+    # Many points at once, positions, columns and rows broadcast against each other.
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    columns = np.asarray(columns).reshape(-1)
+    rows = np.asarray(rows).reshape(-1)
+    count = max(len(positions), len(columns), len(rows))
+    positions = np.broadcast_to(positions, (count, 3))
+    transforms = np.array([
+        key_transform(column, row)
+        for column, row in zip(np.broadcast_to(columns, count), np.broadcast_to(rows, count))
+    ])
+    points = np.concatenate([positions, np.ones((count, 1))], axis=1)
+    return np.einsum('nij,nj->ni', transforms, points)[:, :3]
 
 
+@traced
 def key_holes(side="right"):
-    debugprint('key_holes()')
     # hole = single_plate()
     holes = []
     for column in range(ncols):
@@ -557,7 +697,6 @@ def key_holes(side="right"):
     return shape
 
 def plate_pcb_cutouts(side="right"):
-    debugprint('plate_pcb_cutouts()')
     # hole = single_plate()
     cutouts = []
     for column in range(ncols):
@@ -591,8 +730,7 @@ def caps(cap_type="MX"):
 
 
 def web_post():
-    debugprint('web_post()')
-    post = box(post_size, post_size, web_thickness)
+    post = post_box(post_size, post_size, web_thickness)
     post = translate(post, (0, 0, plate_thickness - (web_thickness / 2)))
     return post
 
@@ -631,8 +769,8 @@ def web_post_br(wide=False):
 
 
 
+@traced
 def connectors():
-    debugprint('connectors()')
     hulls = []
     for column in range(ncols - 1):
         if reduced_inner_cols <= column < (ncols - reduced_outer_cols-1):
@@ -701,7 +839,6 @@ def connectors():
 
 
 def thumborigin():
-    # debugprint('thumborigin()')
 
     corner = cornerrow if reduced_inner_cols > 0 else lastrow
     origin = key_position([mount_width / 2, -(mount_height / 2), 0], 1, corner)
@@ -716,7 +853,6 @@ def thumborigin():
 
 
 def default_thumb_tl_place(shape):
-    debugprint('thumb_tl_place()')
     shape = rotate(shape, [7.5, -18, 10])
     shape = translate(shape, thumborigin())
     shape = translate(shape, [-32.5, -14.5, -2.5])
@@ -724,14 +860,12 @@ def default_thumb_tl_place(shape):
 
 
 def default_thumb_tr_place(shape):
-    debugprint('thumb_tr_place()')
     shape = rotate(shape, [10, -15, 10])
     shape = translate(shape, thumborigin())
     shape = translate(shape, [-12, -16, 3])
     return shape
 
 def default_thumb_mr_place(shape):
-    debugprint('thumb_mr_place()')
     shape = rotate(shape, [-6, -34, 48])
     shape = translate(shape, thumborigin())
     shape = translate(shape, [-29, -40, -13])
@@ -739,7 +873,6 @@ def default_thumb_mr_place(shape):
 
 
 def default_thumb_ml_place(shape):
-    debugprint('thumb_ml_place()')
     shape = rotate(shape, [6, -34, 40])
     shape = translate(shape, thumborigin())
     shape = translate(shape, [-51, -25, -12])
@@ -747,7 +880,6 @@ def default_thumb_ml_place(shape):
 
 
 def default_thumb_br_place(shape):
-    debugprint('thumb_br_place()')
     shape = rotate(shape, [-16, -33, 54])
     shape = translate(shape, thumborigin())
     shape = translate(shape, [-37.8, -55.3, -25.3])
@@ -755,7 +887,6 @@ def default_thumb_br_place(shape):
 
 
 def default_thumb_bl_place(shape):
-    debugprint('thumb_bl_place()')
     shape = rotate(shape, [-4, -35, 52])
     shape = translate(shape, thumborigin())
     shape = translate(shape, [-56.3, -43.3, -23.5])
@@ -763,7 +894,6 @@ def default_thumb_bl_place(shape):
 
 
 def default_thumb_1x_layout(shape, cap=False):
-    debugprint('thumb_1x_layout()')
     if cap:
         shape_list = [
             default_thumb_mr_place(rotate(shape, [0, 0, thumb_plate_mr_rotation])),
@@ -796,7 +926,6 @@ def default_thumb_pcb_plate_cutouts(side="right"):
     return shape
 
 def default_thumb_15x_layout(shape, cap=False, plate=True):
-    debugprint('thumb_15x_layout()')
     if plate:
         if cap:
             shape = rotate(shape, (0, 0, 90))
@@ -835,7 +964,6 @@ def usize_dimention(Usize=1.5):
 
 
 def adjustable_plate_half(Usize=1.5):
-    debugprint('double_plate()')
     adjustable_plate_height = adjustable_plate_size(Usize)
     top_plate = box(mount_width, adjustable_plate_height, web_thickness)
     top_plate = translate(top_plate,
@@ -843,22 +971,21 @@ def adjustable_plate_half(Usize=1.5):
                           )
     return top_plate
 
+@memoized
 def adjustable_plate(Usize=1.5):
-    debugprint('double_plate()')
     top_plate = adjustable_plate_half(Usize)
     return union((top_plate, mirror(top_plate, 'XZ')))
 
+@traced
 def adjustable_square_plate(Uwidth=1.5, Uheight=1.5):
     width = usize_dimention(Usize=Uwidth)
     height = usize_dimention(Usize=Uheight)
-    print("width: {}, height: {}, thickness:{}".format(width, height, web_thickness))
     shape = box(width, height, web_thickness)
     shape = difference(shape, [box(mount_width-.01, mount_height-.01, 2*web_thickness)])
     shape = translate(shape, (0, 0, web_thickness/2))
     return shape
 
 def double_plate_half():
-    debugprint('double_plate()')
     top_plate = box(mount_width, double_plate_height, web_thickness)
     top_plate = translate(top_plate,
                           [0, (double_plate_height + mount_height) / 2, plate_thickness - (web_thickness / 2)]
@@ -866,7 +993,6 @@ def double_plate_half():
     return top_plate
 
 def double_plate():
-    debugprint('double_plate()')
     top_plate = double_plate_half()
     return union((top_plate, mirror(top_plate, 'XZ')))
 
@@ -897,6 +1023,7 @@ def thumbcaps(side='right', style_override=None):
         return default_thumbcaps()
 
 
+@traced
 def thumb(side="right", style_override=None):
     if style_override is None:
         _thumb_style = thumb_style
@@ -923,6 +1050,7 @@ def thumb(side="right", style_override=None):
         return default_thumb(side)
 
 
+@traced
 def thumb_connectors(side='right', style_override=None):
     if style_override is None:
         _thumb_style = thumb_style
@@ -982,7 +1110,6 @@ def default_thumbcaps():
 
 
 def default_thumb(side="right"):
-    print('thumb()')
     shape = default_thumb_1x_layout(rotate(single_plate(side=side), (0, 0, -90)))
     shape = union([shape, default_thumb_15x_layout(rotate(single_plate(side=side), (0, 0, -90)))])
     shape = union([shape, default_thumb_15x_layout(double_plate(), plate=False)])
@@ -994,35 +1121,30 @@ def default_thumb(side="right"):
 
 
 def thumb_post_tr():
-    debugprint('thumb_post_tr()')
     return translate(web_post(),
                      [(mount_width / 2) - post_adj, ((mount_height/2) + double_plate_height) - post_adj, 0]
                      )
 
 
 def thumb_post_tl():
-    debugprint('thumb_post_tl()')
     return translate(web_post(),
                      [-(mount_width / 2) + post_adj, ((mount_height/2) + double_plate_height) - post_adj, 0]
                      )
 
 
 def thumb_post_bl():
-    debugprint('thumb_post_bl()')
     return translate(web_post(),
                      [-(mount_width / 2) + post_adj, -((mount_height/2) + double_plate_height) + post_adj, 0]
                      )
 
 
 def thumb_post_br():
-    debugprint('thumb_post_br()')
     return translate(web_post(),
                      [(mount_width / 2) - post_adj, -((mount_height/2) + double_plate_height) + post_adj, 0]
                      )
 
 
 def default_thumb_connectors():
-    print('thumb_connectors()')
     hulls = []
 
     # Top two
@@ -1443,28 +1565,24 @@ def minidox_thumb_pcb_plate_cutouts(side="right"):
     return shape
 
 def minidox_thumb_post_tr():
-    debugprint('thumb_post_tr()')
     return translate(web_post(),
                      [(mount_width / 2) - post_adj, ((mount_height/2) + adjustable_plate_size(minidox_Usize)) - post_adj, 0]
                      )
 
 
 def minidox_thumb_post_tl():
-    debugprint('thumb_post_tl()')
     return translate(web_post(),
                      [-(mount_width / 2) + post_adj, ((mount_height/2) + adjustable_plate_size(minidox_Usize)) - post_adj, 0]
                      )
 
 
 def minidox_thumb_post_bl():
-    debugprint('thumb_post_bl()')
     return translate(web_post(),
                      [-(mount_width / 2) + post_adj, -((mount_height/2) + adjustable_plate_size(minidox_Usize)) + post_adj, 0]
                      )
 
 
 def minidox_thumb_post_br():
-    debugprint('thumb_post_br()')
     return translate(web_post(),
                      [(mount_width / 2) - post_adj, -((mount_height/2) + adjustable_plate_size(minidox_Usize)) + post_adj, 0]
                      )
@@ -1777,7 +1895,6 @@ def tbjs_place(shape):
 
 
 def tbjs_thumb_tl_place(shape):
-    debugprint('thumb_tr_place()')
     # Modifying to make a "ring" of keys
     shape = rotate(shape, [0, 0, 0])
     t_off = tbjs_key_translation_offsets[0]
@@ -1789,7 +1906,6 @@ def tbjs_thumb_tl_place(shape):
     return shape
 
 def tbjs_thumb_mr_place(shape):
-    debugprint('thumb_mr_place()')
     shape = rotate(shape, [0, 0, 0])
     shape = rotate(shape, tbjs_key_rotation_offsets[1])
     t_off = tbjs_key_translation_offsets[1]
@@ -1800,7 +1916,6 @@ def tbjs_thumb_mr_place(shape):
     return shape
 
 def tbjs_thumb_br_place(shape):
-    debugprint('thumb_br_place()')
 
     shape = rotate(shape, [0, 0, 180])
     shape = rotate(shape, tbjs_key_rotation_offsets[2])
@@ -1813,7 +1928,6 @@ def tbjs_thumb_br_place(shape):
 
 
 def tbjs_thumb_bl_place(shape):
-    debugprint('thumb_bl_place()')
     shape = rotate(shape, [0, 0, 180])
     shape = rotate(shape, tbjs_key_rotation_offsets[3])
     t_off = tbjs_key_translation_offsets[3]
@@ -1872,35 +1986,30 @@ def tbjs_thumb(side="right"):
 
 
 def tbjs_thumb_post_tr():
-    debugprint('thumb_post_tr()')
     return translate(web_post(),
                      [(mount_width / 2) + adjustable_plate_size(tbjs_Uwidth) - post_adj, ((mount_height/2) + adjustable_plate_size(tbjs_Uheight)) - post_adj, 0]
                      )
 
 
 def tbjs_thumb_post_tl():
-    debugprint('thumb_post_tl()')
     return translate(web_post(),
                      [-(mount_width / 2) - adjustable_plate_size(tbjs_Uwidth) + post_adj, ((mount_height/2) + adjustable_plate_size(tbjs_Uheight)) - post_adj, 0]
                      )
 
 
 def tbjs_thumb_post_bl():
-    debugprint('thumb_post_bl()')
     return translate(web_post(),
                      [-(mount_width / 2) - adjustable_plate_size(tbjs_Uwidth) + post_adj, -((mount_height/2) + adjustable_plate_size(tbjs_Uheight)) + post_adj, 0]
                      )
 
 
 def tbjs_thumb_post_br():
-    debugprint('thumb_post_br()')
     return translate(web_post(),
                      [(mount_width / 2) + adjustable_plate_size(tbjs_Uwidth) - post_adj, - ((mount_height/2) + adjustable_plate_size(tbjs_Uheight)) + post_adj, 0]
                      )
 
 
 def tbjs_post_r():
-    debugprint('tbjs_post_r()')
     radius = ball_diameter/2 + ball_wall_thickness + ball_gap
     return translate(web_post(),
                      [1.0*(radius - post_adj), 0.0*(radius - post_adj), 0]
@@ -1908,7 +2017,6 @@ def tbjs_post_r():
 
 
 def tbjs_post_tr():
-    debugprint('tbjs_post_tr()')
     radius = ball_diameter/2+ball_wall_thickness + ball_gap
     return translate(web_post(),
                      [0.5*(radius - post_adj), 0.866*(radius - post_adj), 0]
@@ -1916,7 +2024,6 @@ def tbjs_post_tr():
 
 
 def tbjs_post_tl():
-    debugprint('tbjs_post_tl()')
     radius = ball_diameter/2+ball_wall_thickness + ball_gap
     return translate(web_post(),
                      [-0.5*(radius - post_adj), 0.866*(radius - post_adj), 0]
@@ -1924,14 +2031,12 @@ def tbjs_post_tl():
 
 
 def tbjs_post_l():
-    debugprint('tbjs_post_l()')
     radius = ball_diameter/2+ball_wall_thickness + ball_gap
     return translate(web_post(),
                      [-1.0*(radius - post_adj), 0.0*(radius - post_adj), 0]
                      )
 
 def tbjs_post_bl():
-    debugprint('tbjs_post_bl()')
     radius = ball_diameter/2+ball_wall_thickness + ball_gap
     return translate(web_post(),
                      [-0.5*(radius - post_adj), -0.866*(radius - post_adj), 0]
@@ -1939,7 +2044,6 @@ def tbjs_post_bl():
 
 
 def tbjs_post_br():
-    debugprint('tbjs_post_br()')
     radius = ball_diameter/2+ball_wall_thickness + ball_gap
     return translate(web_post(),
                      [0.5*(radius - post_adj), -0.866*(radius - post_adj), 0]
@@ -1948,7 +2052,6 @@ def tbjs_post_br():
 
 
 def tbjs_thumb_connectors():
-    print('thumb_connectors()')
     hulls = []
 
     # bottom 2 to tb
@@ -2283,7 +2386,6 @@ def tbcj_thumb_connectors():
 ##########
 
 def left_key_position(row, direction, low_corner=False, side='right'):
-    debugprint("left_key_position()")
     pos = np.array(
         key_position([-mount_width * 0.5, direction * mount_height * 0.5, 0], 0, row)
     )
@@ -2318,23 +2420,19 @@ def left_key_position(row, direction, low_corner=False, side='right'):
 
 
 def left_key_place(shape, row, direction, low_corner=False, side='right'):
-    debugprint("left_key_place()")
     pos = left_key_position(row, direction, low_corner=low_corner, side=side)
     return translate(shape, pos)
 
 
 def wall_locate1(dx, dy):
-    debugprint("wall_locate1()")
     return [dx * wall_thickness, dy * wall_thickness, -1]
 
 
 def wall_locate2(dx, dy):
-    debugprint("wall_locate2()")
     return [dx * wall_x_offset, dy * wall_y_offset, -wall_z_offset]
 
 
 def wall_locate3(dx, dy, back=False):
-    debugprint("wall_locate3()")
     if back:
         return [
             dx * (wall_x_offset + wall_base_x_thickness),
@@ -2350,7 +2448,6 @@ def wall_locate3(dx, dy, back=False):
 
 
 def wall_brace(place1, dx1, dy1, post1, place2, dx2, dy2, post2, back=False, skeleton=False, skel_bottom=False):
-    debugprint("wall_brace()")
     hulls = []
 
     hulls.append(place1(post1))
@@ -2389,7 +2486,6 @@ def wall_brace(place1, dx1, dy1, post1, place2, dx2, dy2, post2, back=False, ske
 
 
 def key_wall_brace(x1, y1, dx1, dy1, post1, x2, y2, dx2, dy2, post2, back=False, skeleton=False, skel_bottom=False):
-    debugprint("key_wall_brace()")
     return wall_brace(
         (lambda shape: key_place(shape, x1, y1)),
         dx1,
@@ -2405,8 +2501,8 @@ def key_wall_brace(x1, y1, dx1, dy1, post1, x2, y2, dx2, dy2, post2, back=False,
     )
 
 
+@traced
 def back_wall(skeleton=False):
-    print("back_wall()")
     x = 0
     shape = None
     shape = union([shape, key_wall_brace(
@@ -2437,8 +2533,8 @@ def back_wall(skeleton=False):
     return shape
 
 
+@traced
 def right_wall(skeleton=False):
-    print("right_wall()")
     y = 0
 
     shape = None
@@ -2474,8 +2570,8 @@ def right_wall(skeleton=False):
     return shape
 
 
+@traced
 def left_wall(side='right', skeleton=False):
-    print('left_wall()')
     shape = union([wall_brace(
         (lambda sh: key_place(sh, 0, 0)), 0, 1, web_post_tl(),
         (lambda sh: left_key_place(sh, 0, 1, side=side)), 0, 1, web_post(),
@@ -2530,8 +2626,8 @@ def left_wall(side='right', skeleton=False):
     return shape
 
 
+@traced
 def front_wall(skeleton=False):
-    print('front_wall()')
     shape = None
 
     # shape = union([shape,key_wall_brace(
@@ -2564,58 +2660,54 @@ def front_wall(skeleton=False):
 
     for i in range(ncols - 3):
         x = i + 3
-        print("col {}".format(x))
-        if x < (offset_col - 1):
-            print("pre-offset")
-            if x > 3:
+        with build_trace.span('front_wall_column', 'dactyl_manuform', {'col': x}):
+            if x < (offset_col - 1):
+                if x > 3:
+                    shape = union([shape, key_wall_brace(
+                        x-1, lastrow, 0, -1, web_post_br(), x, lastrow, 0, -1, web_post_bl()
+                    )])
                 shape = union([shape, key_wall_brace(
-                    x-1, lastrow, 0, -1, web_post_br(), x, lastrow, 0, -1, web_post_bl()
+                    x, lastrow, 0, -1, web_post_bl(), x, lastrow, 0, -1, web_post_br()
                 )])
-            shape = union([shape, key_wall_brace(
-                x, lastrow, 0, -1, web_post_bl(), x, lastrow, 0, -1, web_post_br()
-            )])
-        elif x < (offset_col):
-            print("offset setup")
-            if x > 3:
+            elif x < (offset_col):
+                if x > 3:
+                    shape = union([shape, key_wall_brace(
+                        x-1, lastrow, 0, -1, web_post_br(), x, lastrow, 0, -1, web_post_bl()
+                    )])
                 shape = union([shape, key_wall_brace(
-                    x-1, lastrow, 0, -1, web_post_br(), x, lastrow, 0, -1, web_post_bl()
+                    x, lastrow, 0, -1, web_post_bl(), x, lastrow, 0.5, -1, web_post_br()
                 )])
-            shape = union([shape, key_wall_brace(
-                x, lastrow, 0, -1, web_post_bl(), x, lastrow, 0.5, -1, web_post_br()
-            )])
-
-        elif x == (offset_col):
-            print("offset")
-            shape = union([shape, key_wall_brace(
-                x - 1, lastrow, 0.5, -1, web_post_br(), x, cornerrow, .5, -1, web_post_bl()
-            )])
-            shape = union([shape, key_wall_brace(
-                x, cornerrow, .5, -1, web_post_bl(), x, cornerrow, 0, -1, web_post_br()
-            )])
-
-        elif x == (offset_col + 1):
-            print("offset completion")
-            shape = union([shape, key_wall_brace(
-                x, cornerrow, 0, -1, web_post_bl(), x - 1, cornerrow, 0, -1, web_post_br()
-            )])
-            shape = union([shape, key_wall_brace(
-                x, cornerrow, 0, -1, web_post_bl(), x, cornerrow, 0, -1, web_post_br()
-            )])
 
+            elif x == (offset_col):
+                shape = union([shape, key_wall_brace(
+                    x - 1, lastrow, 0.5, -1, web_post_br(), x, cornerrow, .5, -1, web_post_bl()
+                )])
+                shape = union([shape, key_wall_brace(
+                    x, cornerrow, .5, -1, web_post_bl(), x, cornerrow, 0, -1, web_post_br()
+                )])
 
-        else:
-            print("post offset")
-            shape = union([shape, key_wall_brace(
-                x, cornerrow, 0, -1, web_post_bl(), x - 1, corner, 0, -1, web_post_br()
-            )])
-            shape = union([shape, key_wall_brace(
-                x, cornerrow, 0, -1, web_post_bl(), x, corner, 0, -1, web_post_br()
-            )])
+            elif x == (offset_col + 1):
+                shape = union([shape, key_wall_brace(
+                    x, cornerrow, 0, -1, web_post_bl(), x - 1, cornerrow, 0, -1, web_post_br()
+                )])
+                shape = union([shape, key_wall_brace(
+                    x, cornerrow, 0, -1, web_post_bl(), x, cornerrow, 0, -1, web_post_br()
+                )])
+
+
+            else:
+                shape = union([shape, key_wall_brace(
+                    x, cornerrow, 0, -1, web_post_bl(), x - 1, corner, 0, -1, web_post_br()
+                )])
+                shape = union([shape, key_wall_brace(
+                    x, cornerrow, 0, -1, web_post_bl(), x, corner, 0, -1, web_post_br()
+                )])
 
 
     return shape
 
 
+@traced
 def thumb_walls(side='right', style_override=None, skeleton=False):
     if style_override is None:
         _thumb_style = thumb_style
@@ -2641,6 +2733,7 @@ def thumb_walls(side='right', style_override=None, skeleton=False):
     else:
         return default_thumb_walls(skeleton=skeleton)
 
+@traced
 def thumb_connection(side='right', style_override=None, skeleton=False):
     if style_override is None:
         _thumb_style = thumb_style
@@ -2667,7 +2760,6 @@ def thumb_connection(side='right', style_override=None, skeleton=False):
 
 
 def default_thumb_walls(skeleton=False):
-    print('thumb_walls()')
     # thumb, walls
     if default_1U_cluster:
         shape = union([wall_brace(default_thumb_mr_place, 0, -1, web_post_br(), default_thumb_tr_place, 0, -1, web_post_br())])
@@ -2695,7 +2787,6 @@ def default_thumb_walls(skeleton=False):
 
 
 def default_thumb_connection(side='right', skeleton=False):
-    print('thumb_connection()')
     # clunky bit on the top left thumb connection  (normal connectors don't work well)
     shape = None
     shape = union([shape, bottom_hull(
@@ -2751,7 +2842,6 @@ def default_thumb_connection(side='right', skeleton=False):
 
 
 def tbjs_thumb_connection(side='right', skeleton=False):
-    print('thumb_connection()')
     # clunky bit on the top left thumb connection  (normal connectors don't work well)
     hulls = []
     hulls.append(
@@ -2794,7 +2884,6 @@ def tbjs_thumb_connection(side='right', skeleton=False):
 
 
 def tbjs_thumb_walls(skeleton=False):
-    print('thumb_walls()')
     # thumb, walls
     shape = wall_brace(
         tbjs_thumb_mr_place, .5, 1, tbjs_thumb_post_tr(),
@@ -3141,8 +3230,8 @@ def carbonfet_thumb_connection(side='right', skeleton=False):
 
     return shape
 
+@traced
 def case_walls(side='right', skeleton=False):
-    print('case_walls()')
     return (
         union([
             back_wall(skeleton=skeleton),
@@ -3155,34 +3244,18 @@ def case_walls(side='right', skeleton=False):
     )
 
 
-rj9_start = list(
-    np.array([0, -3, 0])
-    + np.array(
-        key_position(
-            list(np.array(wall_locate3(0, 1)) + np.array([0, (mount_height / 2), 0])),
-            0,
-            0,
-        )
-    )
-)
-
-rj9_position = (rj9_start[0], rj9_start[1], 11)
-
-
 def rj9_cube():
-    debugprint('rj9_cube()')
     shape = box(14.78, 13, 22.38)
 
     return shape
 
 
 def rj9_space():
-    debugprint('rj9_space()')
     return translate(rj9_cube(), rj9_position)
 
 
+@traced
 def rj9_holder():
-    print('rj9_holder()')
     shape = union([translate(box(10.78, 9, 18.38), (0, 2, 0)), translate(box(10.78, 13, 5), (0, 0, 5))])
     shape = difference(rj9_cube(), [shape])
     shape = translate(shape, rj9_position)
@@ -3190,15 +3263,12 @@ def rj9_holder():
     return shape
 
 
-usb_holder_position = key_position(
-    list(np.array(wall_locate2(0, 1)) + np.array([0, (mount_height / 2), 0])), 1, 0
-)
 usb_holder_size = [6.5, 10.0, 13.6]
 usb_holder_thickness = 4
 
 
+@traced
 def usb_holder():
-    print('usb_holder()')
     shape = box(
         usb_holder_size[0] + usb_holder_thickness,
         usb_holder_size[1],
@@ -3215,7 +3285,6 @@ def usb_holder():
 
 
 def usb_holder_hole():
-    debugprint('usb_holder_hole()')
     shape = box(*usb_holder_size)
     shape = translate(shape,
         (
@@ -3227,20 +3296,8 @@ def usb_holder_hole():
     return shape
 
 
-external_start = list(
-    # np.array([0, -3, 0])
-    np.array([external_holder_width / 2, 0, 0])
-    + np.array(
-        key_position(
-            list(np.array(wall_locate3(0, 1)) + np.array([0, (mount_height / 2), 0])),
-            0,
-            0,
-        )
-    )
-)
-
+@traced
 def external_mount_hole():
-    print('external_mount_hole()')
     shape = box(external_holder_width, 20.0, external_holder_height+.1)
     undercut = box(external_holder_width+8, 10.0, external_holder_height+8+.1)
     shape = union([shape, translate(undercut,(0, -5, 0))])
@@ -3256,17 +3313,7 @@ def external_mount_hole():
 
 
 
-pcb_mount_ref_position = key_position(
-    #TRRS POSITION IS REFERENCE BY CONVENIENCE
-    list(np.array(wall_locate3(0, 1)) + np.array([0, (mount_height / 2), 0])), 0, 0
-)
-
-pcb_mount_ref_position[0] = pcb_mount_ref_position[0] + pcb_mount_ref_offset[0]
-pcb_mount_ref_position[1] = pcb_mount_ref_position[1] + pcb_mount_ref_offset[1]
-pcb_mount_ref_position[2] = 0.0 + pcb_mount_ref_offset[2]
-
 def pcb_usb_hole():
-    debugprint('pcb_holder()')
     pcb_usb_position = copy.deepcopy(pcb_mount_ref_position)
     pcb_usb_position[0] = pcb_usb_position[0] + pcb_usb_hole_offset[0]
     pcb_usb_position[1] = pcb_usb_position[1] + pcb_usb_hole_offset[1]
@@ -3284,14 +3331,7 @@ def pcb_usb_hole():
 
 
 
-pcb_holder_position = copy.deepcopy(pcb_mount_ref_position)
-pcb_holder_position[0] = pcb_holder_position[0] + pcb_holder_offset[0]
-pcb_holder_position[1] = pcb_holder_position[1] + pcb_holder_offset[1]
-pcb_holder_position[2] = pcb_holder_position[2] + pcb_holder_offset[2]
-pcb_holder_thickness = pcb_holder_size[2]
-
 def pcb_holder():
-    debugprint('pcb_holder()')
     shape = box(*pcb_holder_size)
     shape = translate(shape,
         (
@@ -3304,7 +3344,6 @@ def pcb_holder():
 
 
 def wall_thinner():
-    debugprint('wall_thinner()')
     shape = box(*wall_thinner_size)
     shape = translate(shape,
         (
@@ -3319,7 +3358,6 @@ def wall_thinner():
 
 
 def trrs_hole():
-    debugprint('trrs_hole()')
     trrs_position = copy.deepcopy(pcb_mount_ref_position)
     trrs_position[0] = trrs_position[0] + trrs_offset[0]
     trrs_position[1] = trrs_position[1] + trrs_offset[1]
@@ -3339,11 +3377,7 @@ def trrs_hole():
     )
     return shape
 
-pcb_screw_position = copy.deepcopy(pcb_mount_ref_position)
-pcb_screw_position[1] = pcb_screw_position[1] + pcb_screw_y_offset
-
 def pcb_screw_hole():
-    debugprint('pcb_screw_hole()')
     holes = []
     hole = cylinder(*pcb_screw_hole_size)
     hole = translate(hole, pcb_screw_position)
@@ -3354,28 +3388,6 @@ def pcb_screw_hole():
     return holes
 
 
-if oled_center_row is not None:
-    base_pt1 = key_position(
-        list(np.array([-mount_width/2, 0, 0]) + np.array([0, (mount_height / 2), 0])), 0, oled_center_row-1
-    )
-    base_pt2 = key_position(
-        list(np.array([-mount_width/2, 0, 0]) + np.array([0, (mount_height / 2), 0])), 0, oled_center_row+1
-    )
-    base_pt0 = key_position(
-        list(np.array([-mount_width / 2, 0, 0]) + np.array([0, (mount_height / 2), 0])), 0, oled_center_row
-    )
-
-    oled_mount_location_xyz = (np.array(base_pt1)+np.array(base_pt2))/2. + np.array(((-left_wall_x_offset/2), 0, 0)) + np.array(oled_translation_offset)
-    oled_mount_location_xyz[2] = (oled_mount_location_xyz[2] + base_pt0[2])/2
-
-    angle_x = np.arctan2(base_pt1[2] - base_pt2[2], base_pt1[1] - base_pt2[1])
-    angle_z = np.arctan2(base_pt1[0] - base_pt2[0], base_pt1[1] - base_pt2[1])
-
-    oled_mount_rotation_xyz = (rad2deg(angle_x), 0, -rad2deg(angle_z)) + np.array(oled_rotation_offset)
-
-
-
-
 def generate_trackball(pos, rot):
     precut = trackball_cutout()
     precut = rotate(precut, tb_socket_rotation_offset)
@@ -3416,6 +3428,7 @@ def generate_trackball(pos, rot):
     # return precut, shape, cutout, ball
     return precut, shape, cutout, sensor, ball
 
+@traced
 def generate_trackball_in_cluster():
     if thumb_style == 'TRACKBALL_ORBYL':
         pos, rot = tbjs_thumb_position_rotation()
@@ -3426,17 +3439,9 @@ def generate_trackball_in_cluster():
 
 
 def tbiw_position_rotation():
-    base_pt1 = key_position(
-        list(np.array([-mount_width/2, 0, 0]) + np.array([0, (mount_height / 2), 0])),
-        0, cornerrow - tbiw_ball_center_row - 1
-    )
-    base_pt2 = key_position(
-        list(np.array([-mount_width/2, 0, 0]) + np.array([0, (mount_height / 2), 0])),
-        0, cornerrow - tbiw_ball_center_row + 1
-    )
-    base_pt0 = key_position(
-        list(np.array([-mount_width / 2, 0, 0]) + np.array([0, (mount_height / 2), 0])),
-        0, cornerrow - tbiw_ball_center_row
+    ball_row = cornerrow - tbiw_ball_center_row
+    base_pt1, base_pt2, base_pt0 = key_positions(
+        [-mount_width / 2, mount_height / 2, 0], 0, [ball_row - 1, ball_row + 1, ball_row]
     )
 
     left_wall_x_offset = tbiw_left_wall_x_offset_override
@@ -3455,6 +3460,7 @@ def tbiw_position_rotation():
 
     return tbiw_mount_location_xyz, tbiw_mount_rotation_xyz
 
+@traced
 def generate_trackball_in_wall():
     pos, rot = tbiw_position_rotation()
     return generate_trackball(pos, rot)
@@ -3474,14 +3480,8 @@ def oled_position_rotation(side='right'):
         _oled_rotation_offset = oled_rotation_offset
 
     if _oled_center_row is not None:
-        base_pt1 = key_position(
-            list(np.array([-mount_width/2, 0, 0]) + np.array([0, (mount_height / 2), 0])), 0, _oled_center_row-1
-        )
-        base_pt2 = key_position(
-            list(np.array([-mount_width/2, 0, 0]) + np.array([0, (mount_height / 2), 0])), 0, _oled_center_row+1
-        )
-        base_pt0 = key_position(
-            list(np.array([-mount_width / 2, 0, 0]) + np.array([0, (mount_height / 2), 0])), 0, _oled_center_row
+        base_pt1, base_pt2, base_pt0 = key_positions(
+            [-mount_width / 2, mount_height / 2, 0], 0, [_oled_center_row - 1, _oled_center_row + 1, _oled_center_row]
         )
 
         if trackball_in_wall and (side == ball_side or ball_side == 'both'):
@@ -3765,8 +3765,8 @@ def oled_undercut_mount_frame(side='right'):
 
 
 
+@traced
 def teensy_holder():
-    print('teensy_holder()')
     teensy_top_xy = key_position(wall_locate3(-1, 0), 0, centerrow - 1)
     teensy_bot_xy = key_position(wall_locate3(-1, 0), 0, centerrow + 1)
     teensy_holder_length = teensy_top_xy[1] - teensy_bot_xy[1]
@@ -3811,7 +3811,6 @@ def teensy_holder():
 
 
 def screw_insert_shape(bottom_radius, top_radius, height):
-    debugprint('screw_insert_shape()')
     if bottom_radius == top_radius:
         base = cylinder(radius=bottom_radius, height=height)
     else:
@@ -3825,28 +3824,24 @@ def screw_insert_shape(bottom_radius, top_radius, height):
 
 
 def screw_insert(column, row, bottom_radius, top_radius, height, side='right'):
-    debugprint('screw_insert()')
     shift_right = column == lastcol
     shift_left = column == 0
     shift_up = (not (shift_right or shift_left)) and (row == 0)
     shift_down = (not (shift_right or shift_left)) and (row >= lastrow)
 
     if screws_offset == 'INSIDE':
-        # debugprint('Shift Inside')
         shift_left_adjust = wall_base_x_thickness
         shift_right_adjust = -wall_base_x_thickness/2
         shift_down_adjust = -wall_base_y_thickness/2
         shift_up_adjust = -wall_base_y_thickness/3
 
     elif screws_offset == 'OUTSIDE':
-        debugprint('Shift Outside')
         shift_left_adjust = 0
         shift_right_adjust = wall_base_x_thickness/2
         shift_down_adjust = wall_base_y_thickness*2/3
         shift_up_adjust = wall_base_y_thickness*2/3
 
     else:
-        # debugprint('Shift Origin')
         shift_left_adjust = 0
         shift_right_adjust = 0
         shift_down_adjust = 0
@@ -3938,8 +3933,8 @@ def thumb_screw_insert(bottom_radius, top_radius, height, offset=None, side='rig
 
     return shapes
 
+@traced
 def screw_insert_all_shapes(bottom_radius, top_radius, height, offset=0, side='right'):
-    print('screw_insert_all_shapes()')
     shape = (
         translate(screw_insert(0, 0, bottom_radius, top_radius, height, side=side), (0, 0, offset)),
         translate(screw_insert(0, cornerrow, bottom_radius, top_radius, height, side=side), (0, left_wall_lower_y_offset, offset)),
@@ -3957,6 +3952,7 @@ def thumb_screw_insert_holes(side='right'):
         screw_insert_bottom_radius, screw_insert_top_radius, screw_insert_height+.02, offset=-.01, side=side
     )
 
+@traced
 def thumb_screw_insert_outers(offset=0.0, side='right'):
     # screw_insert_bottom_radius + screw_insert_wall
     # screw_insert_top_radius + screw_insert_wall
@@ -3970,6 +3966,7 @@ def screw_insert_holes(side='right'):
         screw_insert_bottom_radius, screw_insert_top_radius, screw_insert_height+.02, offset=-.01, side=side
     )
 
+@traced
 def screw_insert_outers(offset=0.0, side='right'):
     # screw_insert_bottom_radius + screw_insert_wall
     # screw_insert_top_radius + screw_insert_wall
@@ -3985,7 +3982,6 @@ def screw_insert_screw_holes(side='right'):
 
 
 def wire_post(direction, offset):
-    debugprint('wire_post()')
     s1 = box(
         wire_post_diameter, wire_post_diameter, wire_post_height
     )
@@ -4007,7 +4003,6 @@ def wire_post(direction, offset):
 
 
 def wire_posts():
-    debugprint('wire_posts()')
     shape = default_thumb_ml_place(wire_post(1, 0).translate([-5, 0, -2]))
     shape = union([shape, default_thumb_ml_place(wire_post(-1, 6).translate([0, 0, -2.5]))])
     shape = union([shape, default_thumb_ml_place(wire_post(1, 0).translate([5, 0, -2]))])
@@ -4023,22 +4018,10 @@ def wire_posts():
     return shape
 
 
-def model_side(side="right"):
-    print('model_right()')
-    #shape = add([key_holes(side=side)])
-    shape = union([key_holes(side=side)])
-    if debug_exports:
-        export_file(shape=shape, fname=path.join(r"..", "things", r"debug_key_plates"))
-    connector_shape = connectors()
-    shape = union([shape, connector_shape])
-    if debug_exports:
-        export_file(shape=shape, fname=path.join(r"..", "things", r"debug_connector_shape"))
-    walls_shape = case_walls(side=side, skeleton=skeletal)
-    if debug_exports:
-        export_file(shape=walls_shape, fname=path.join(r"..", "things", r"debug_walls_shape"))
-
+@traced
+def case_body(walls_shape, screw_outers, side="right"):
     s2 = union([walls_shape])
-    s2 = union([s2, *screw_insert_outers(side=side)])
+    s2 = union([s2, *screw_outers])
 
     if controller_mount_type in ['RJ9_USB_TEENSY', 'USB_TEENSY']:
         s2 = union([s2, teensy_holder()])
@@ -4054,38 +4037,52 @@ def model_side(side="right"):
         s2 = difference(s2, [external_mount_hole()])
 
     if controller_mount_type in ['PCB_MOUNT']:
-        s2 = difference(s2, [pcb_usb_hole()])
-        s2 = difference(s2, [trrs_hole()])
+        s2 = difference(s2, [pcb_usb_hole(), trrs_hole()])
         s2 = union([s2, pcb_holder()])
-        s2 = difference(s2, [wall_thinner()])
-        s2 = difference(s2, pcb_screw_hole())
+        s2 = difference(s2, [wall_thinner(), *pcb_screw_hole()])
 
     if controller_mount_type in [None, 'None']:
         0 # do nothing, only here to expressly state inaction.
 
-    s2 = difference(s2, [union(screw_insert_holes(side=side))])
-    shape = union([shape, s2])
+    s2 = difference(s2, screw_insert_holes(side=side))
+    return s2
 
-    if controller_mount_type in ['RJ9_USB_TEENSY', 'RJ9_USB_WALL']:
-        shape = union([shape, rj9_holder()])
 
+@traced
+def oled_mount(side="right"):
     if oled_mount_type == "UNDERCUT":
-        hole, frame = oled_undercut_mount_frame(side=side)
-        shape = difference(shape, [hole])
-        shape = union([shape, frame])
+        return oled_undercut_mount_frame(side=side)
 
     elif oled_mount_type == "SLIDING":
-        hole, frame = oled_sliding_mount_frame(side=side)
-        shape = difference(shape, [hole])
-        shape = union([shape, frame])
+        return oled_sliding_mount_frame(side=side)
 
     elif oled_mount_type == "CLIP":
-        hole, frame = oled_clip_mount_frame(side=side)
+        return oled_clip_mount_frame(side=side)
+
+    return None
+
+
+@traced
+def main_body(key_holes_shape, connector_shape, case_shape, oled, wall_trackball, side="right"):
+    shape = union([key_holes_shape])
+    if debug_exports:
+        export_file(shape=shape, fname=path.join(r"..", "things", r"debug_key_plates"))
+    shape = union([shape, connector_shape])
+    if debug_exports:
+        export_file(shape=shape, fname=path.join(r"..", "things", r"debug_connector_shape"))
+
+    shape = union([shape, case_shape])
+
+    if controller_mount_type in ['RJ9_USB_TEENSY', 'RJ9_USB_WALL']:
+        shape = union([shape, rj9_holder()])
+
+    if oled is not None:
+        hole, frame = oled
         shape = difference(shape, [hole])
         shape = union([shape, frame])
 
     if trackball_in_wall and (side == ball_side or ball_side == 'both') and separable_thumb:
-        tbprecut, tb, tbcutout, sensor, ball = generate_trackball_in_wall()
+        tbprecut, tb, tbcutout, sensor, ball = wall_trackball
 
         shape = difference(shape, [tbprecut])
         # export_file(shape=shape, fname=path.join(save_path, config_name + r"_test_1"))
@@ -4102,34 +4099,31 @@ def model_side(side="right"):
     if plate_pcb_clear:
         shape = difference(shape, [plate_pcb_cutouts(side=side)])
 
-    main_shape = shape
+    block = box(350, 350, 40)
+    block = translate(block, (0, 0, -20))
+    shape = difference(shape, [block])
+
+    return shape
 
-    #BUILD THUMB
 
-    thumb_shape = thumb(side=side)
+@traced
+def thumb_body(thumb_shape, thumb_connector_shape, thumb_wall_shape, thumb_screw_outers, thumb_connection_shape,
+               cluster_trackball, side="right"):
     if debug_exports:
         export_file(shape=thumb_shape, fname=path.join(r"..", "things", r"debug_thumb_shape"))
-    thumb_connector_shape = thumb_connectors(side=side)
-    if debug_exports:
         export_file(shape=thumb_connector_shape, fname=path.join(r"..", "things", r"debug_thumb_connector_shape"))
 
-    thumb_wall_shape = thumb_walls(side=side, skeleton=skeletal)
-    thumb_wall_shape = union([thumb_wall_shape, *thumb_screw_insert_outers(side=side)])
-    thumb_connection_shape = thumb_connection(side=side, skeleton=skeletal)
-
+    thumb_wall_shape = union([thumb_wall_shape, *thumb_screw_outers])
 
     if debug_exports:
         thumb_test = union([thumb_shape, thumb_connector_shape, thumb_wall_shape, thumb_connection_shape])
         export_file(shape=thumb_test, fname=path.join(r"..", "things", r"debug_thumb_test_{}_shape".format(side)))
 
     thumb_section = union([thumb_shape, thumb_connector_shape, thumb_wall_shape, thumb_connection_shape])
-    thumb_section = difference(thumb_section, [union(thumb_screw_insert_holes(side=side))])
+    thumb_section = difference(thumb_section, thumb_screw_insert_holes(side=side))
 
-    has_trackball = False
-    if ('TRACKBALL' in thumb_style) and (side == ball_side or ball_side == 'both'):
-        print("Has Trackball")
-        tbprecut, tb, tbcutout, sensor, ball = generate_trackball_in_cluster()
-        has_trackball = True
+    if cluster_trackball is not None:
+        tbprecut, tb, tbcutout, sensor, ball = cluster_trackball
         thumb_section = difference(thumb_section, [tbprecut])
         if debug_exports:
             export_file(shape=thumb_section, fname=path.join(r"..", "things", r"debug_thumb_test_1_shape".format(side)))
@@ -4148,11 +4142,116 @@ def model_side(side="right"):
 
     block = box(350, 350, 40)
     block = translate(block, (0, 0, -20))
-    main_shape = difference(main_shape, [block])
     thumb_section = difference(thumb_section, [block])
     if debug_exports:
         export_file(shape=thumb_section, fname=path.join(r"..", "things", r"debug_thumb_test_5_shape".format(side)))
 
+    return thumb_section
+
+
+def new_graph():
+    return BuildGraph(
+        workers=build_workers if ENGINE == 'cadquery' else 1,
+        serialize=serialize_shape,
+        deserialize=deserialize_shape,
+        memory_limit=int(build_worker_memory * 2**30) if build_worker_memory else None,
+    )
+
+
+def side_graph(side="right"):
+    has_trackball = ('TRACKBALL' in thumb_style) and (side == ball_side or ball_side == 'both')
+    has_wall_trackball = trackball_in_wall and (side == ball_side or ball_side == 'both')
+
+    # Subassemblies only meet in the body merges, everything above those can build in parallel.
+    graph = new_graph()
+    graph.add('key_holes', cached(key_holes), side=side)
+    graph.add('connectors', cached(connectors))
+    graph.add('case_walls', cached(case_walls), side=side, skeleton=skeletal)
+    graph.add('screw_insert_outers', screw_insert_outers, side=side)
+    graph.add('oled_mount', oled_mount, side=side)
+    graph.add('wall_trackball', generate_trackball_in_wall if has_wall_trackball else (lambda: None))
+    graph.add('thumb', cached(thumb), side=side)
+    graph.add('thumb_connectors', cached(thumb_connectors), side=side)
+    graph.add('thumb_walls', cached(thumb_walls), side=side, skeleton=skeletal)
+    graph.add('thumb_screw_insert_outers', thumb_screw_insert_outers, side=side)
+    graph.add('thumb_connection', cached(thumb_connection), side=side, skeleton=skeletal)
+    graph.add('cluster_trackball', generate_trackball_in_cluster if has_trackball else (lambda: None))
+
+    graph.add('case', case_body, inputs=('case_walls', 'screw_insert_outers'), side=side)
+    graph.add('main', main_body,
+              inputs=('key_holes', 'connectors', 'case', 'oled_mount', 'wall_trackball'), side=side)
+    graph.add('thumb_section', thumb_body,
+              inputs=('thumb', 'thumb_connectors', 'thumb_walls', 'thumb_screw_insert_outers',
+                      'thumb_connection', 'cluster_trackball'), side=side)
+    return graph
+
+
+def graph_key(name, node):
+    return (name, tuple(sorted(node.kwargs.items())))
+
+
+def side_dependent_nodes(graph):
+    # Nodes of a left half graph that differ from the right half ones, with every node they feed.
+    sided = set()
+    if plate_file is not None or (plate_holes and plate_holes_xy_offset[0] != 0):
+        sided.update(['key_holes', 'thumb'])
+    if plate_pcb_clear and plate_pcb_offset[0] != 0:
+        sided.update(['main', 'thumb_section'])
+    # A wall trackball moves the whole left wall, the thumb connection hangs off it too.
+    if trackball_in_wall and ball_side != 'both':
+        sided.update(['case_walls', 'screw_insert_outers', 'oled_mount', 'wall_trackball', 'case', 'thumb_connection'])
+    if 'TRACKBALL' in thumb_style and ball_side != 'both':
+        sided.update(['thumb', 'thumb_connectors', 'thumb_walls', 'thumb_screw_insert_outers', 'thumb_connection',
+                      'cluster_trackball', 'thumb_section'])
+
+    for name, node in graph.nodes.items():
+        if any(item in sided for item in node.inputs):
+            sided.add(name)
+    return sided
+
+
+@traced
+def mirror_patch(graph, context):
+    # Left half from the finished right one.  The left half is built in the right hand
+    # frame and mirrored at the end, so every subassembly that does not depend on the
+    # side is taken over from the right half and only the side dependent ones (hot swap
+    # plates, trackball, other_thumb cluster) are rebuilt, with the merges they feed.
+    right = {}
+    for name, node in side_graph(side='right').nodes.items():
+        if graph_key(name, node) not in context:
+            return graph.run()
+        right[name] = context[graph_key(name, node)]
+
+    sided = side_dependent_nodes(graph)
+    rebuilt = ', '.join(name for name in graph.nodes if name in sided)
+    with build_trace.span('mirror_patch_rebuild', 'dactyl_manuform', {'rebuilt': rebuilt}):
+        return graph.run(done={name: right[name] for name in graph.nodes if name not in sided})
+
+
+@traced
+def model_side(side="right", context=None):
+    graph = side_graph(side=side)
+    if side == 'left' and left_side_build == 'PATCH' and context is not None:
+        results = mirror_patch(graph, context)
+    else:
+        results = graph.run()
+    if context is not None:
+        for name, node in graph.nodes.items():
+            context[graph_key(name, node)] = results[name]
+
+    return side_body(
+        results['main'], results['thumb_section'], results['wall_trackball'], results['cluster_trackball'], side=side
+    )
+
+
+@traced
+def side_body(main_shape, thumb_section, wall_trackball, cluster_trackball, side="right"):
+    has_trackball = ('TRACKBALL' in thumb_style) and (side == ball_side or ball_side == 'both')
+    has_wall_trackball = trackball_in_wall and (side == ball_side or ball_side == 'both')
+
+    if has_trackball:
+        ball = cluster_trackball[4]
+
     if separable_thumb:
         thumb_section = difference(thumb_section, [main_shape])
         if show_caps:
@@ -4168,8 +4267,8 @@ def model_side(side="right"):
             if has_trackball:
                 main_shape = add([main_shape, ball])
 
-        if trackball_in_wall and (side == ball_side or ball_side == 'both') and not separable_thumb:
-            tbprecut, tb, tbcutout, sensor, ball = generate_trackball_in_wall()
+        if has_wall_trackball and not separable_thumb:
+            tbprecut, tb, tbcutout, sensor, ball = wall_trackball
 
             main_shape = difference(main_shape, [tbprecut])
             # export_file(shape=shape, fname=path.join(save_path, config_name + r"_test_1"))
@@ -4197,90 +4296,90 @@ def model_side(side="right"):
     return main_shape, thumb_section
 
 
+def baseplate_screw_holes(side='right', context=None):
+    # (x, y, radius) of every hole through the plate, at the screw insert centres.
+    main_centers = [item.val().BoundingBox().center for item in shared(context, screw_insert_outers, side=side)]
+    thumb_centers = [item.val().BoundingBox().center for item in shared(context, thumb_screw_insert_outers, side=side)]
+    holes = [(center.x, center.y, screw_hole_diameter / 2.) for center in [*main_centers, *thumb_centers]]
+    # The thumb section is cut by the insert holes too, they reach through the floor.
+    holes.extend((center.x, center.y, screw_insert_bottom_radius) for center in thumb_centers)
+    return holes
+
+
+@traced
+def baseplate_outline(side='right', context=None):
+    # 2D footprint of the case at z = 0: every piece that reaches the floor is
+    # sliced on its own, the slices are fused and the screw holes cut, all on faces.
+    if ENGINE != 'cadquery':
+        return None
+
+    pieces = [
+        shared(context, case_walls, side=side, skeleton=False),
+        *shared(context, screw_insert_outers, side=side),
+        shared(context, thumb, side=side),
+        shared(context, thumb_connectors, side=side),
+        shared(context, thumb_walls, side=side, skeleton=skeletal),
+        *shared(context, thumb_screw_insert_outers, side=side),
+        shared(context, thumb_connection, side=side, skeleton=skeletal),
+    ]
+    floor = cq.Face.makePlane(1000, 1000, basePnt=(0, 0, 0.0001))
+    faces = []
+    for piece in pieces:
+        if piece is None:
+            continue
+        solid = piece.findSolid()
+        bounds = solid.BoundingBox()
+        if bounds.zmin < 0.0001 < bounds.zmax:
+            faces.extend(solid.intersect(floor).Faces())
+    if not faces:
+        raise ValueError("Config {} ({} side): no part of the case reaches z = 0, there is no baseplate footprint".format(
+            config_name, side))
+
+    holes = [
+        cq.Face.makeFromWires(cq.Wire.makeCircle(radius, cq.Vector(x, y, 0.0001), cq.Vector(0, 0, 1)))
+        for x, y, radius in baseplate_screw_holes(side=side, context=context)
+    ]
+    outline = faces[0].fuse(*faces[1:]).clean().cut(*holes).clean()
+    outline = outline.translate(cq.Vector(0, 0, -0.0001))
+    return cq.Workplane('XY').add(outline.Faces())
+
+
 # NEEDS TO BE SPECIAL FOR CADQUERY
 #def baseplate(main_shape, base_shape, wedge_angle=None, side='right'):
-def baseplate(wedge_angle=None, side='right'):
+@traced
+def baseplate(wedge_angle=None, side='right', context=None):
     if ENGINE == 'cadquery':
-        # shape = mod_r
-
-
-        thumb_shape = thumb(side=side)
-        thumb_wall_shape = thumb_walls(side=side, skeleton=skeletal)
-        thumb_wall_shape = union([thumb_wall_shape, *thumb_screw_insert_outers(side=side)])
-        thumb_connector_shape = thumb_connectors(side=side)
-        thumb_connection_shape = thumb_connection(side=side, skeleton=skeletal)
-        thumb_section = union([thumb_shape, thumb_connector_shape, thumb_wall_shape, thumb_connection_shape])
-        thumb_section = difference(thumb_section, [union(thumb_screw_insert_holes(side=side))])
+        outline = shared(context, baseplate_outline, side=side)
+        faces = outline.faces().vals()
+
+        # The largest face is the rim ring, its largest hole is the floor of the case.
+        rim_face = max(faces, key=lambda face: face.Area())
+        inner_wires = rim_face.innerWires()
+        if inner_wires:
+            inner_wire = max(inner_wires, key=lambda wire: cq.Face.makeFromWires(wire).Area())
+        else:
+            # Thin or degenerate walls fuse into a footprint without a hole, the floor then fills the outline.
+            print("WARNING: CONFIG {} ({} SIDE): BASEPLATE FOOTPRINT HAS NO INNER WIRE, USING ITS OUTLINE".format(
+                config_name, side))
+            inner_wire = rim_face.outerWire()
 
-        shape = union([
-            case_walls(side=side),
-            *screw_insert_outers(side=side),
-            thumb_section
-        ])
-        tool = screw_insert_all_shapes(screw_hole_diameter/2., screw_hole_diameter/2., 350, side=side)
-        for item in tool:
-            item = translate(item, [0, 0, -10])
-            shape = difference(shape, [item])
-
-        tool = thumb_screw_insert(screw_hole_diameter/2., screw_hole_diameter/2., 350, side=side)
-        for item in tool:
-            item = translate(item, [0, 0, -10])
-            shape = difference(shape, [item])
-
-        #shape = union([main_shape, thumb_shape])
-
-        shape = translate(shape, (0, 0, -0.0001))
-
-        square = cq.Workplane('XY').rect(1000, 1000)
-        for wire in square.wires().objects:
-            plane = cq.Workplane('XY').add(cq.Face.makeFromWires(wire))
-        shape = intersect(shape, plane)
-
-        outside = shape.vertices(cq.DirectionMinMaxSelector(cq.Vector(1, 0, 0), True)).objects[0]
-        sizes = []
-        max_val = 0
-        inner_index = 0
-        base_wires = shape.wires().objects
-        for i_wire, wire in enumerate(base_wires):
-            is_outside = False
-            for vert in wire.Vertices():
-                if vert.toTuple() == outside.toTuple():
-                    outer_wire = wire
-                    outer_index = i_wire
-                    is_outside = True
-                    sizes.append(0)
-            if not is_outside:
-                sizes.append(len(wire.Vertices()))
-            if sizes[-1]>max_val:
-                inner_index = i_wire
-                max_val = sizes[-1]
-        debugprint(sizes)
-        inner_wire = base_wires[inner_index]
-
-        # inner_plate = cq.Workplane('XY').add(cq.Face.makeFromWires(inner_wire))
         if wedge_angle is not None:
             cq.Workplane('XY').add(cq.Solid.revolve(outerWire, innerWires, angleDegrees, axisStart, axisEnd))
         else:
-            inner_shape = cq.Workplane('XY').add(cq.Solid.extrudeLinear(outerWire=inner_wire, innerWires=[], vecNormal=cq.Vector(0, 0, base_thickness)))
+            inner_shape = cq.Workplane('XY').add(
+                cq.Solid.extrudeLinear(inner_wire, [], cq.Vector(0, 0, base_thickness))
+            )
             inner_shape = translate(inner_shape, (0, 0, -base_rim_thickness))
 
-            holes = []
-            for i in range(len(base_wires)):
-                if i not in [inner_index, outer_index]:
-                    holes.append(base_wires[i])
-            cutout = [*holes, inner_wire]
-
-            shape = cq.Workplane('XY').add(cq.Solid.extrudeLinear(outer_wire, cutout, cq.Vector(0, 0, base_rim_thickness)))
-            hole_shapes=[]
-            for hole in holes:
-                loc = hole.Center()
-                hole_shapes.append(
-                    translate(
-                        cylinder(screw_cbore_diameter/2.0, screw_cbore_depth),
-                        (loc.x, loc.y, 0)
-                        # (loc.x, loc.y, screw_cbore_depth/2)
-                    )
-                )
+            shape = cq.Workplane('XY').add([
+                cq.Solid.extrudeLinear(face.outerWire(), face.innerWires(), cq.Vector(0, 0, base_rim_thickness))
+                for face in faces
+            ])
+            centers = sorted(set((x, y) for x, y, radius in baseplate_screw_holes(side=side, context=context)))
+            hole_shapes = [
+                translate(cylinder(screw_cbore_diameter/2.0, screw_cbore_depth), (x, y, 0))
+                for x, y in centers
+            ]
             shape = difference(shape, hole_shapes)
             shape = translate(shape, (0, 0, -base_rim_thickness))
             shape = union([shape, inner_shape])
@@ -4290,10 +4389,10 @@ def baseplate(wedge_angle=None, side='right'):
     else:
 
         shape = union([
-            case_walls(side=side),
-            *screw_insert_outers(side=side),
-            thumb_walls(side=side),
-            *thumb_screw_insert_outers(side=side),
+            shared(context, case_walls, side=side, skeleton=False),
+            *shared(context, screw_insert_outers, side=side),
+            shared(context, thumb_walls, side=side, skeleton=False),
+            *shared(context, thumb_screw_insert_outers, side=side),
         ])
 
         tool = translate(union(screw_insert_screw_holes(side=side)), [0, 0, -10])
@@ -4305,53 +4404,184 @@ def baseplate(wedge_angle=None, side='right'):
 
         return sl.projection(cut=True)(shape)
 
-def run():
-
-    mod_r, tmb_r = model_side(side="right")
-    export_file(shape=mod_r, fname=path.join(save_path, config_name + r"_right"))
-    export_file(shape=tmb_r, fname=path.join(save_path, config_name + r"_thumb_right"))
+# Subassemblies baseplate looks up in its build context.
+plate_nodes = (
+    'case_walls', 'screw_insert_outers', 'thumb', 'thumb_connectors', 'thumb_walls', 'thumb_screw_insert_outers',
+    'thumb_connection',
+)
 
-    #base = baseplate(mod_r, tmb_r, side='right')
-    base = baseplate(side='right')
-    export_file(shape=base, fname=path.join(save_path, config_name + r"_right_plate"))
-    export_dxf(shape=base, fname=path.join(save_path, config_name + r"_right_plate"))
 
-    if symmetry == "asymmetric":
-        mod_l, tmb_l = model_side(side="left")
-        export_file(shape=mod_l, fname=path.join(save_path, config_name + r"_left"))
-        export_file(shape=tmb_l, fname=path.join(save_path, config_name + r"_thumb_left"))
+@traced
+def export_side(main_shape, thumb_section, wall_trackball, cluster_trackball, side="right"):
+    mod, tmb = side_body(main_shape, thumb_section, wall_trackball, cluster_trackball, side=side)
+    files = [
+        export_file(shape=mod, fname=path.join(save_path, config_name + r"_" + side)),
+        export_file(shape=tmb, fname=path.join(save_path, config_name + r"_thumb_" + side)),
+    ]
 
-        #base_l = mirror(baseplate(mod_l, tmb_l, side='left'), 'YZ')
-        base_l = mirror(baseplate(side='left'), 'YZ')
-        export_file(shape=base_l, fname=path.join(save_path, config_name + r"_left_plate"))
-        export_dxf(shape=base_l, fname=path.join(save_path, config_name + r"_left_plate"))
+    if symmetry != "asymmetric":
+        files.append(export_file(shape=mirror(mod, 'YZ'), fname=path.join(save_path, config_name + r"_left")))
+    return files
 
-    else:
-        export_file(shape=mirror(mod_r, 'YZ'), fname=path.join(save_path, config_name + r"_left"))
 
-        lbase = mirror(base, 'YZ')
-        export_file(shape=lbase, fname=path.join(save_path, config_name + r"_left_plate"))
-        export_dxf(shape=lbase, fname=path.join(save_path, config_name + r"_left_plate"))
+@traced
+def export_plate(*pieces, side="right"):
+    nodes = side_graph(side=side).nodes
+    context = {graph_key(name, nodes[name]): piece for name, piece in zip(plate_nodes, pieces)}
 
+    base = cached(baseplate)(side=side, context=context)
+    base_outline = shared(context, baseplate_outline, side=side)
+    if side == "left":
+        base = mirror(base, 'YZ')
+        base_outline = mirror(base_outline, 'YZ')
+    files = [
+        export_file(shape=base, fname=path.join(save_path, config_name + r"_" + side + r"_plate")),
+        export_dxf(shape=base_outline, fname=path.join(save_path, config_name + r"_" + side + r"_plate")),
+    ]
 
+    if symmetry != "asymmetric":
+        files.append(export_file(shape=mirror(base, 'YZ'), fname=path.join(save_path, config_name + r"_left_plate")))
+        files.append(export_dxf(shape=mirror(base_outline, 'YZ'), fname=path.join(save_path, config_name + r"_left_plate")))
+    return [fname for fname in files if fname is not None]
 
 
+@traced
+def export_oled():
+    files = []
     if oled_mount_type == 'UNDERCUT':
-        export_file(shape=oled_undercut_mount_frame()[1], fname=path.join(save_path, config_name + r"_oled_undercut_test"))
+        files.append(export_file(shape=oled_undercut_mount_frame()[1], fname=path.join(save_path, config_name + r"_oled_undercut_test")))
 
     if oled_mount_type == 'SLIDING':
-        export_file(shape=oled_sliding_mount_frame()[1], fname=path.join(save_path, config_name + r"_oled_sliding_test"))
+        files.append(export_file(shape=oled_sliding_mount_frame()[1], fname=path.join(save_path, config_name + r"_oled_sliding_test")))
 
     if oled_mount_type == 'CLIP':
-        oled_mount_location_xyz = (0.0, 0.0, -oled_mount_depth / 2)
-        oled_mount_rotation_xyz = (0.0, 0.0, 0.0)
-        export_file(shape=oled_clip(), fname=path.join(save_path, config_name + r"_oled_clip"))
-        export_file(shape=oled_clip_mount_frame()[1],
-                            fname=path.join(save_path, config_name + r"_oled_clip_test"))
-        export_file(shape=union((oled_clip_mount_frame()[1], oled_clip())),
-                            fname=path.join(save_path, config_name + r"_oled_clip_assy_test"))
+        files.append(export_file(shape=oled_clip(), fname=path.join(save_path, config_name + r"_oled_clip")))
+        files.append(export_file(shape=oled_clip_mount_frame()[1],
+                            fname=path.join(save_path, config_name + r"_oled_clip_test")))
+        files.append(export_file(shape=union((oled_clip_mount_frame()[1], oled_clip())),
+                            fname=path.join(save_path, config_name + r"_oled_clip_assy_test")))
+    return files
+
+
+def release_graph():
+    # Both halves and their plates in one graph, each output is exported by the worker
+    # that builds it.  A patched left half links to the right half nodes it shares.
+    graph = new_graph()
+    names = {}
+    for side in (["right", "left"] if symmetry == "asymmetric" else ["right"]):
+        nodes = side_graph(side=side)
+        links = {}
+        if side == "left" and left_side_build == 'PATCH':
+            sided = side_dependent_nodes(nodes)
+            links = {name: names[name] for name in nodes.nodes if name not in sided}
+        names = graph.merge(nodes, side + '/', links)
+
+        graph.add(side + '/export', export_side,
+                  inputs=[names[name] for name in ('main', 'thumb_section', 'wall_trackball', 'cluster_trackball')],
+                  side=side)
+        graph.add(side + '/plate', export_plate, inputs=[names[name] for name in plate_nodes], side=side)
+    graph.add('oled', export_oled)
+    return graph
+
+
+###############################################
+# ARTIFACT MANIFEST
+###############################################
+# things/<save_dir>/manifest.json maps every release output to the files it
+# wrote and a key over everything it is built from: the build cache keys of its
+# node and all nodes upstream, which cover the config values and derived data
+# they read, the engine and the source and part files.  run() only rebuilds the
+# outputs whose key changed or whose files are gone.
+
+manifest_file = "manifest.json"
+
+
+def release_outputs(graph):
+    consumed = set(item for node in graph.nodes.values() for item in node.inputs)
+    return [name for name in graph.nodes if name not in consumed]
+
+
+def artifact_key(graph, name):
+    keys = []
+    stack = [name]
+    seen = set()
+    while stack:
+        item = stack.pop()
+        if item not in seen:
+            seen.add(item)
+            node = graph.nodes[item]
+            keys.append(cache_key(node.fn, (), node.kwargs))
+            stack.extend(node.inputs)
+    return build_cache.combine_keys(keys)
+
+
+def load_manifest():
+    fname = path.join(save_path, manifest_file)
+    if not path.isfile(fname):
+        return {}
+    with open(fname, mode='r') as fid:
+        return json.load(fid)
+
+
+def save_manifest(manifest):
+    fname = path.join(save_path, manifest_file)
+    with open(fname + '.tmp', mode='w') as fid:
+        json.dump(manifest, fid, indent=4, sort_keys=True)
+    os.replace(fname + '.tmp', fname)
+
+
+def up_to_date(entry, key):
+    return entry is not None and entry['key'] == key and all(path.isfile(fname) for fname in entry['files'])
+
+
+def run():
+    print('Found Current Engine in Config = {}'.format(ENGINE))
+    build_trace.reset()
+    with build_trace.span('run', args={'config_name': config_name, 'engine': ENGINE}):
+        graph = release_graph()
+        manifest = load_manifest()
+        keys = {name: artifact_key(graph, name) for name in release_outputs(graph)}
+        stale = [name for name in keys if not up_to_date(manifest.get(name), keys[name])]
+        for name in keys:
+            if name not in stale:
+                print("UP TO DATE: {}".format(name))
+
+        if stale:
+            results = graph.subgraph(stale).run()
+            for name in stale:
+                manifest[name] = {'key': keys[name], 'files': results[name]}
+            save_manifest({name: manifest[name] for name in keys})
+
+    if build_trace.enabled:
+        build_trace.save(path.join(save_path, trace_file))
+    return stale
 
 # base = baseplate()
 # export_file(shape=base, fname=path.join(save_path, config_name + r"_plate"))
+
+# Nothing is configured on import, callers configure() before building.
+_module_names = set(globals())
+
 if __name__ == '__main__':
-    run()
+    # --queue dir leaves the build to the workers of a shared build queue, see model_builder --work.
+    opts, args = getopt.getopt(sys.argv[1:], "", ["config=", "queue="])
+    data = None
+    queue_dir = None
+    for opt, arg in opts:
+        if opt in ('--config'):
+            with open(os.path.join(r"..", "configs", arg + '.json'), mode='r') as fid:
+                data = json.load(fid)
+        elif opt == '--queue':
+            queue_dir = arg
+
+    if data is None:
+        print("NO CONFIGURATION SPECIFIED, USING run_config.json")
+        with open(os.path.join(r".", 'run_config.json'), mode='r') as fid:
+            data = json.load(fid)
+
+    config = cfg.Config(**data)
+    if queue_dir is not None:
+        BuildQueue(queue_dir).submit("{}_{}".format(config.config_name, config.ENGINE), config.as_dict())
+    else:
+        configure(config)
+        run()
@@ -2,6 +2,7 @@ import sys
 import getopt
 import os
 import json
+import copy
 
 
 pi = 3.14159
@@ -12,6 +13,11 @@ shape_config = {
 
     'ENGINE': 'solid',  # 'solid' = solid python / OpenSCAD, 'cadquery' = cadquery / OpenCascade
     # 'ENGINE': 'cadquery',  # 'solid' = solid python / OpenSCAD, 'cadquery' = cadquery / OpenCascade
+    'build_workers': None,  # cadquery subassembly build processes, None = one per CPU core, 1 = build serially
+    'union_strategy': 'FUSE',  # cadquery unions: 'FOLD' one piece at a time, 'TREE' balanced pairs, 'FUSE' single general fuse
+    'build_cache_dir': None,  # e.g. '../cache', reuses unchanged subassemblies (key well, walls, thumb, plate) between runs
+    'build_worker_memory': None,  # GB of address space per build process, None = no limit
+    'trace_file': None,  # e.g. 'trace.json', timeline of the builders and engine helpers in things/<save_dir>, open in chrome://tracing
 
 
     ######################
@@ -35,6 +41,9 @@ shape_config = {
 
     # symmetry states if it is a symmetric or asymmetric bui.  If asymmetric it doubles the generation time.
     'symmetry':  "symmetric",  # "asymmetric" or "symmetric"
+    # asymmetric builds: 'PATCH' takes the left half over from the right one and rebuilds only the side
+    # dependent parts (hot swap plates, one sided trackball and its cluster), 'FULL' builds it from scratch
+    'left_side_build': 'PATCH',
 
     'column_style_gt5':  "orthographic",
     'column_style':  "standard",  # options include :standard, :orthographic, and :fixed
@@ -473,6 +482,47 @@ shape_config = {
     ## END CONFIGURATION SECTION
     ####################################
 
+
+class Config:
+    # Frozen set of build settings, one slot per shape_config key.  Keys left out
+    # keep their defaults, use replace() for a changed copy.
+    __slots__ = tuple(shape_config)
+
+    def __init__(self, **values):
+        for name in values:
+            if name not in shape_config:
+                print("IGNORING UNKNOWN CONFIG KEY {}".format(name))
+        for name in self.__slots__:
+            object.__setattr__(self, name, copy.deepcopy(values.get(name, shape_config[name])))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Config is frozen, use replace() to change {}".format(name))
+
+    def __delattr__(self, name):
+        raise AttributeError("Config is frozen, use replace() to change {}".format(name))
+
+    def __reduce__(self):
+        return (Config.from_dict, (self.as_dict(),))
+
+    def __eq__(self, other):
+        return isinstance(other, Config) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return "Config(config_name={!r}, ENGINE={!r})".format(self.config_name, self.ENGINE)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def as_dict(self):
+        return {name: copy.deepcopy(getattr(self, name)) for name in self.__slots__}
+
+    def replace(self, **values):
+        data = self.as_dict()
+        data.update(values)
+        return Config(**data)
+
+
 def save_config():
     # Check to see if the user has specified an alternate config
     opts, args = getopt.getopt(sys.argv[1:], "", ["config=", "update="])
@@ -505,5 +555,6 @@ if __name__ == '__main__':
     save_config()
 
     ## HERE FOR QUICK TESTING, SHOULD BE COMMENTED ON COMMIT
-    # from dactyl_manuform import *
-    # run()
+    # import dactyl_manuform
+    # dactyl_manuform.configure(Config(**shape_config))
+    # dactyl_manuform.run()
@@ -497,5 +497,7 @@ if __name__ == '__main__':
     save_config()
 
     ## HERE FOR QUICK TESTING, SHOULD BE COMMENTED ON COMMIT
-    from dactyl_manuform import *
-    run()
\ No newline at end of file
+    import dactyl_manuform
+    from generate_configuration import Config
+    dactyl_manuform.configure(Config(**shape_config))
+    dactyl_manuform.run()
\ No newline at end of file
@@ -6,13 +6,9 @@ import time
 import mathutils
 from math import pi, radians, sin, cos
 from contextlib import contextmanager
+from build_trace import traced
 
 
-debug_trace = False
-
-def debugprint(info):
-    if debug_trace:
-        print(info)
 
 def box(width, height, depth):
     return bpy.ops.mesh.primitive_cube_add(size=1, location=(0, 0, 0), scale=(width, height, depth))
@@ -44,8 +40,8 @@ def translate(shape, vector):
     bpy.ops.transform.translate(value=vector, orient_type='GLOBAL', orient_matrix=((1, 0, 0), (0, 1, 0), (0, 0, 1)), orient_matrix_type='GLOBAL', mirror=True, use_proportional_edit=False, proportional_edit_falloff='SMOOTH', proportional_size=1, use_proportional_connected=False, use_proportional_projected=False)
     return
 
+@traced
 def mirror(shape, plane=None):
-    debugprint('mirror()')
     planes = {
         'XY': [0, 0, 1],
         'YX': [0, 0, -1],
@@ -57,8 +53,8 @@ def mirror(shape, plane=None):
     return sl.mirror(planes[plane])(shape)
 
 
+@traced
 def union(shapes):
-    debugprint('union()')
     shape = None
     for item in shapes:
         if shape is None:
@@ -68,8 +64,8 @@ def union(shapes):
     return shape
 
 
+@traced
 def add(shapes):
-    debugprint('union()')
     shape = None
     for item in shapes:
         if shape is None:
@@ -79,22 +75,25 @@ def add(shapes):
     return shape
 
 
+@traced
 def difference(shape, shapes):
-    debugprint('difference()')
     for item in shapes:
         if item is not None:
             shape -= item
     return shape
 
 
+@traced
 def intersect(shape1, shape2):
     return sl.intersect()(shape1, shape2)
 
 
+@traced
 def hull_from_points(points):
     return sl.hull()(*points)
 
 
+@traced
 def hull_from_shapes(shapes, points=None):
     hs = []
     if points is not None:
@@ -104,12 +103,13 @@ def hull_from_shapes(shapes, points=None):
     return sl.hull()(*hs)
 
 
+@traced
 def tess_hull(shapes, sl_tol=.5, sl_angTol=1):
     return sl.hull()(*shapes)
 
 
+@traced
 def triangle_hulls(shapes):
-    debugprint('triangle_hulls()')
     hulls = []
     for i in range(len(shapes) - 2):
         hulls.append(hull_from_shapes(shapes[i: (i + 3)]))
@@ -126,6 +126,7 @@ def polyline(point_list):
 #     for wire in square.wires().objects:
 #         plane = cq.Workplane('XY').add(cq.Face.makeFromWires(wire))
 
+@traced
 def extrude_poly(outer_poly, inner_polys=None, height=1):
     if inner_polys is not None:
         return sl.linear_extrude(height=height, twist=0, convexity=0, center=True)(outer_poly, *inner_polys)
@@ -133,16 +134,20 @@ def extrude_poly(outer_poly, inner_polys=None, height=1):
         return sl.linear_extrude(height=height, twist=0, convexity=0, center=True)(outer_poly)
 
 
+@traced
 def import_file(fname, convexity=5):
     print("IMPORTING FROM {}".format(fname))
     return sl.import_(fname + ".stl", convexity=convexity)
 
 
+@traced
 def export_file(shape, fname):
     print("EXPORTING TO {}".format(fname))
     sl.scad_render_to_file(shape, fname + ".scad")
+    return fname + ".scad"
 
 
+@traced
 def export_dxf(shape, fname):
     print("NO DXF EXPORT FOR SOLID".format(fname))
     pass
\ No newline at end of file
@@ -1,19 +1,57 @@
 import cadquery as cq
+from OCP.gp import gp_Pnt, gp_Trsf
+from OCP.BRepBuilderAPI import BRepBuilderAPI_MakeFace, BRepBuilderAPI_MakePolygon
 from scipy.spatial import ConvexHull as sphull
 import numpy as np
+import io
+import os
+from build_trace import traced
+from transforms import translation_matrix, rotation_matrix
 
 
-debug_trace = False
-
-def debugprint(info):
-    if debug_trace:
-        print(info)
 
 
 def box(width, height, depth):
     return cq.Workplane("XY").box(width, height, depth)
 
 
+class PostPoints:
+    # Corners of a small box that is only ever hulled (web posts).  Placing it
+    # moves the points in NumPy, an OCC solid is made only if something other
+    # than a hull asks for one.
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=float)
+
+    def transformed(self, matrix):
+        matrix = np.asarray(matrix, dtype=float)
+        return PostPoints(self.points @ matrix[:3, :3].T + matrix[:3, 3])
+
+    def solid(self):
+        return hull_from_points(self.points)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.solid(), name)
+
+
+def post_box(width, height, depth):
+    corners = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=float)
+    return PostPoints(corners * [width / 2, height / 2, depth / 2])
+
+
+def solid_shape(shape):
+    if isinstance(shape, PostPoints):
+        return shape.solid()
+    return shape
+
+
+def shape_points(shape):
+    if isinstance(shape, PostPoints):
+        return shape.points
+    return np.array([vert.toTuple() for vert in shape.vertices().objects]).reshape(-1, 3)
+
+
 def cylinder(radius, height, segments=100):
     shape = cq.Workplane("XY").union(cq.Solid.makeCylinder(radius=radius, height=height))
     shape = translate(shape, (0, 0, -height/2))
@@ -29,123 +67,204 @@ def cone(r1, r2, height):
         cq.Solid.makeCone(radius1=r1, radius2=r2, height=height))
 
 
+# Placements only compose the TopLoc_Location of the shapes on the stack, the
+# BRep is shared rather than copied and OCC applies the accumulated transform
+# once, when the shape is used in a boolean, queried or exported.
+def place(shape, location):
+    if shape is None:
+        return None
+    return shape.newObject([
+        item.moved(location) if isinstance(item, cq.Shape) else item
+        for item in shape.objects
+    ])
+
+
 def rotate(shape, angle):
     if shape is None:
         return None
-    origin = (0, 0, 0)
-    shape = shape.rotate(axisStartPoint=origin, axisEndPoint=(1, 0, 0), angleDegrees=angle[0])
-    shape = shape.rotate(axisStartPoint=origin, axisEndPoint=(0, 1, 0), angleDegrees=angle[1])
-    shape = shape.rotate(axisStartPoint=origin, axisEndPoint=(0, 0, 1), angleDegrees=angle[2])
-    return shape
+    if isinstance(shape, PostPoints):
+        return shape.transformed(rotation_matrix(angle))
+    location = cq.Location()
+    for axis, angle_degrees in zip(((1, 0, 0), (0, 1, 0), (0, 0, 1)), angle):
+        if angle_degrees != 0:
+            location = cq.Location(cq.Vector(), cq.Vector(*axis), float(angle_degrees)) * location
+    return place(shape, location)
 
 
 def translate(shape, vector):
     if shape is None:
         return None
-    return shape.translate(tuple(vector))
+    if isinstance(shape, PostPoints):
+        return shape.transformed(translation_matrix(vector))
+    return place(shape, cq.Location(cq.Vector(*[float(item) for item in vector[:3]])))
+
+
+def transform(shape, matrix):
+    # 4x4 homogeneous matrix with a rigid rotation part.
+    if isinstance(shape, PostPoints):
+        return shape.transformed(matrix)
+    trsf = gp_Trsf()
+    trsf.SetValues(*[float(item) for item in np.asarray(matrix)[:3, :4].flatten()])
+    return place(shape, cq.Location(trsf))
 
 
+@traced
 def mirror(shape, plane=None):
-    debugprint('mirror()')
+    if shape is None:
+        return None
+    if isinstance(shape, PostPoints):
+        normal = {'X': 0, 'Y': 1, 'Z': 2}[({'X', 'Y', 'Z'} - set(plane)).pop()]
+        return shape.transformed(np.diag([-1.0 if i == normal else 1.0 for i in range(3)] + [1.0]))
     return shape.mirror(mirrorPlane=plane)
 
 
-def union(shapes):
-    debugprint('union()')
+# 'FOLD' unions one piece at a time onto the growing result, 'TREE' unions
+# neighbouring pairs level by level, 'FUSE' hands every solid to one general fuse.
+default_union_strategy = 'FUSE'
+
+
+@traced
+def union(shapes, strategy=None):
+    if strategy is None:
+        strategy = default_union_strategy
+
+    shapes = [solid_shape(item) for item in shapes if item is not None]
+    if len(shapes) < 2:
+        return union_fold(shapes)
+
+    # Pieces without a solid have nothing to union, every strategy leaves them out.
+    # Empty ones are placeholders, anything else is reported.
+    solid_shapes = [item for item in shapes if item.solids().size() > 0]
+    dropped = [item for item in shapes if item.solids().size() == 0 and item.vals()]
+    if dropped:
+        print("WARNING: UNION DROPS {} OF {} PIECES WITHOUT A SOLID: {}".format(
+            len(dropped), len(shapes), ', '.join(type(item.val()).__name__ for item in dropped)))
+    if not solid_shapes:
+        return union_fold(shapes)
+
+    if strategy == 'FOLD' or len(solid_shapes) < 2:
+        return union_fold(solid_shapes)
+    elif strategy == 'TREE':
+        return union_tree(solid_shapes)
+    elif strategy == 'FUSE':
+        return union_fuse(solid_shapes)
+    raise ValueError("Unknown union strategy: {}".format(strategy))
+
+
+def union_fold(shapes):
     shape = None
     for item in shapes:
-        if item is not None:
-            if shape is None:
-                shape = item
-            else:
-                shape = shape.union(item)
+        if shape is None:
+            shape = item
+        else:
+            shape = shape.union(item)
     return shape
 
 
+def union_tree(shapes):
+    while len(shapes) > 1:
+        pairs = [shapes[i].union(shapes[i + 1]) for i in range(0, len(shapes) - 1, 2)]
+        if len(shapes) % 2:
+            pairs.append(shapes[-1])
+        shapes = pairs
+    return shapes[0]
+
+
+def union_fuse(shapes):
+    solids = []
+    for item in shapes:
+        solids.extend(item.solids().vals())
+    shape = solids[0].fuse(*solids[1:]).clean()
+    return cq.Workplane('XY').add(shape)
+
+
+@traced
 def add(shapes):
-    debugprint('union()')
     shape = None
     for item in shapes:
         if item is not None:
             if shape is None:
-                shape = item
+                shape = solid_shape(item)
             else:
-                shape = shape.add(item)
+                shape = shape.add(solid_shape(item))
     return shape
 
 
-def difference(shape, shapes):
-    debugprint('difference()')
-    for item in shapes:
-        if item is not None:
-            shape = shape.cut(item)
-    return shape
+def boxes_overlap(box1, box2, tol=1e-3):
+    return (
+        box1.xmin <= box2.xmax + tol and box2.xmin <= box1.xmax + tol
+        and box1.ymin <= box2.ymax + tol and box2.ymin <= box1.ymax + tol
+        and box1.zmin <= box2.zmax + tol and box2.zmin <= box1.zmax + tol
+    )
 
 
+@traced
+def difference(shape, shapes):
+    tools = []
+    stack = list(shapes)
+    while stack:
+        item = stack.pop(0)
+        if isinstance(item, (list, tuple)):
+            stack[:0] = item
+        elif item is not None:
+            tools.extend(solid_shape(item).solids().vals())
+
+    # Tools clear of the target cannot change it, the rest go into one cut.
+    shape = solid_shape(shape)
+    target_box = shape.findSolid().BoundingBox()
+    tools = [item for item in tools if boxes_overlap(target_box, item.BoundingBox())]
+    if not tools:
+        return shape
+    return shape.cut(cq.Workplane('XY').add(tools))
+
+
+@traced
 def intersect(shape1, shape2):
     if shape2 is not None:
-        return shape1.intersect(shape2)
+        return solid_shape(shape1).intersect(solid_shape(shape2))
     else:
         return shape1
 
 def face_from_points(points):
-    # debugprint('face_from_points()')
-    edges = []
-    num_pnts = len(points)
-    for i in range(len(points)):
-        p1 = points[i]
-        p2 = points[(i + 1) % num_pnts]
-        edges.append(
-            cq.Edge.makeLine(
-                cq.Vector(p1[0], p1[1], p1[2]),
-                cq.Vector(p2[0], p2[1], p2[2]),
-            )
-        )
-
-    face = cq.Face.makeFromWires(cq.Wire.assembleEdges(edges))
+    # Hull facets are planar by construction, so the polygon goes straight to a face.
+    polygon = BRepBuilderAPI_MakePolygon()
+    for point in points:
+        polygon.Add(gp_Pnt(float(point[0]), float(point[1]), float(point[2])))
+    polygon.Close()
+
+    face = cq.Face(BRepBuilderAPI_MakeFace(polygon.Wire(), True).Face())
 
     return face
 
 
+@traced
 def hull_from_points(points):
-    # debugprint('hull_from_points()')
+    points = np.asarray(points, dtype=float)
     hull_calc = sphull(points)
-    n_faces = len(hull_calc.simplices)
 
-    faces = []
-    for i in range(n_faces):
-        face_items = hull_calc.simplices[i]
-        fpnts = []
-        for item in face_items:
-            fpnts.append(points[item])
-        faces.append(face_from_points(fpnts))
+    faces = [face_from_points(points[face_items]) for face_items in hull_calc.simplices]
 
     shape = cq.Solid.makeSolid(cq.Shell.makeShell(faces))
     shape = cq.Workplane('XY').union(shape)
     return shape
 
 
+@traced
 def hull_from_shapes(shapes, points=None):
-    # debugprint('hull_from_shapes()')
-    vertices = []
-    for shape in shapes:
-        verts = shape.vertices()
-        for vert in verts.objects:
-            vertices.append(np.array(vert.toTuple()))
+    vertices = [shape_points(shape) for shape in shapes]
     if points is not None:
-        for point in points:
-            vertices.append(np.array(point))
+        vertices.append(np.array(points, dtype=float).reshape(-1, 3))
 
-    shape = hull_from_points(vertices)
+    shape = hull_from_points(np.concatenate(vertices))
     return shape
 
 
+@traced
 def tess_hull(shapes, sl_tol=.5, sl_angTol=1):
-    # debugprint('hull_from_shapes()')
     vertices = []
     solids = []
     for wp in shapes:
-        for item in wp.solids().objects:
+        for item in solid_shape(wp).solids().objects:
             solids.append(item)
 
     for shape in solids:
@@ -157,8 +276,8 @@ def tess_hull(shapes, sl_tol=.5, sl_angTol=1):
     return shape
 
 
+@traced
 def triangle_hulls(shapes):
-    debugprint('triangle_hulls()')
     hulls = [cq.Workplane('XY')]
     for i in range(len(shapes) - 2):
         hulls.append(hull_from_shapes(shapes[i: (i + 3)]))
@@ -169,34 +288,13 @@ def triangle_hulls(shapes):
 
 
 
+@traced
 def bottom_hull(p, height=0.001):
-    debugprint("bottom_hull()")
-    shape = None
-    for item in p:
-        vertices = []
-        # verts = item.faces('<Z').vertices()
-        verts = item.faces().vertices()
-        for vert in verts.objects:
-            v0 = vert.toTuple()
-            v1 = [v0[0], v0[1], -10]
-            vertices.append(np.array(v0))
-            vertices.append(np.array(v1))
-
-        t_shape = hull_from_points(vertices)
-
-        # t_shape = translate(t_shape, [0, 0, height / 2 - 10])
-
-        if shape is None:
-            shape = t_shape
-
-        for shp in (*p, shape, t_shape):
-            try:
-                shp.vertices()
-            except:
-                0
-        shape = union([shape, hull_from_shapes((shape, t_shape))])
-
-    return shape
+    # Convex hull of every vertex together with its drop to z = -10, built once.
+    points = np.concatenate([shape_points(item) for item in p])
+    floor_points = points.copy()
+    floor_points[:, 2] = -10
+    return hull_from_points(np.concatenate([points, floor_points]))
 
 
 def polyline(point_list):
@@ -209,6 +307,7 @@ def polyline(point_list):
 #         plane = cq.Workplane('XY').add(cq.Face.makeFromWires(wire))
 
 
+@traced
 def extrude_poly(outer_poly, inner_polys=None, height=1):  # vector=(0,0,1)):
     outer_wires = cq.Wire.assembleEdges(outer_poly.edges().objects)
     inner_wires = []
@@ -220,20 +319,85 @@ def extrude_poly(outer_poly, inner_polys=None, height=1):  # vector=(0,0,1)):
         cq.Solid.extrudeLinear(outerWire=outer_wires, innerWires=inner_wires, vecNormal=cq.Vector(0, 0, height)))
 
 
+# Parsed parts, keyed by STEP path and modification time.
+imported_parts = {}
+
+
+def import_part(fname):
+    step_file = fname + ".step"
+    brep_file = fname + ".brep"
+    step_mtime = os.path.getmtime(step_file)
+    key = (os.path.abspath(step_file), step_mtime)
+    if key in imported_parts:
+        return imported_parts[key]
+
+    part = None
+    if os.path.isfile(brep_file) and os.path.getmtime(brep_file) >= step_mtime:
+        print("IMPORTING FROM {}".format(brep_file))
+        try:
+            part = cq.Shape.importBrep(brep_file)
+        except Exception as err:
+            # Unreadable, the STEP is read again and the BRep replaced.
+            print("UNABLE TO READ {}: {!r}".format(brep_file, err))
+
+    if part is None:
+        print("IMPORTING FROM {}".format(step_file))
+        shapes = cq.importers.importStep(step_file).vals()
+        part = shapes[0] if len(shapes) == 1 else cq.Compound.makeCompound(shapes)
+        # Native BRep beside the STEP, much faster to read on the next run.  Written
+        # under a temporary name and renamed, graph workers may import the part at once.
+        temp_name = "{}.{}.tmp".format(brep_file, os.getpid())
+        try:
+            if part.exportBrep(temp_name):
+                os.replace(temp_name, brep_file)
+            else:
+                print("UNABLE TO WRITE {}".format(brep_file))
+        except OSError:
+            print("UNABLE TO WRITE {}".format(brep_file))
+        if os.path.isfile(temp_name):
+            os.remove(temp_name)
+
+    imported_parts[key] = part
+    return part
+
+
+@traced
 def import_file(fname, convexity=None):
-    print("IMPORTING FROM {}".format(fname))
-    return cq.Workplane('XY').add(cq.importers.importShape(
-        cq.exporters.ExportTypes.STEP,
-        fname + ".step"))
+    return cq.Workplane('XY').add(import_part(fname))
 
 
+@traced
 def export_file(shape, fname):
     print("EXPORTING TO {}".format(fname))
-    cq.exporters.export(w=shape, fname=fname + ".step",
+    cq.exporters.export(w=solid_shape(shape), fname=fname + ".step",
                         exportType='STEP')
+    return fname + ".step"
 
 
+@traced
 def export_dxf(shape, fname):
     print("EXPORTING TO {}".format(fname))
-    cq.exporters.export(w=shape, fname=fname + ".dxf",
-                        exportType='DXF')
\ No newline at end of file
+    cq.exporters.export(w=solid_shape(shape), fname=fname + ".dxf",
+                        exportType='DXF')
+    return fname + ".dxf"
+
+
+serialized_extension = 'brep'
+
+
+def serialize_shape(shape):
+    shape = solid_shape(shape)
+    shapes = [item for item in shape.vals() if isinstance(item, cq.Shape)]
+    if len(shapes) == 1:
+        shape = shapes[0]
+    elif len(shapes) > 1:
+        shape = cq.Compound.makeCompound(shapes)
+    else:
+        shape = shape.findSolid()
+    stream = io.BytesIO()
+    shape.exportBrep(stream)
+    return stream.getvalue()
+
+
+def deserialize_shape(data):
+    return cq.Workplane('XY').add(cq.Shape.importBrep(io.BytesIO(data)))
@@ -1,15 +1,19 @@
 import solid as sl
+import numpy as np
+from scipy.spatial import ConvexHull as sphull
+from build_trace import traced
+from transforms import translation_matrix, rotation_matrix
 
-debug_trace = False
-
-def debugprint(info):
-    if debug_trace:
-        print(info)
 
 def box(width, height, depth):
     return sl.cube([width, height, depth], center=True)
 
 
+def post_box(width, height, depth):
+    # OpenSCAD hulls the cube itself, nothing to precompute.
+    return box(width, height, depth)
+
+
 def cylinder(radius, height, segments=100):
     return sl.cylinder(r=radius, h=height, segments=segments, center=True)
 
@@ -25,17 +29,51 @@ def cone(r1, r2, height):
 def rotate(shape, angle):
     if shape is None:
         return None
+    if node_matrix(shape) is not None:
+        return transform(shape, rotation_matrix(angle))
     return sl.rotate(angle)(shape)
 
 
 def translate(shape, vector):
     if shape is None:
         return None
+    if node_matrix(shape) is not None:
+        return transform(shape, translation_matrix(vector))
     return sl.translate(tuple(vector))(shape)
 
 
+def node_matrix(shape):
+    # Matrix of a plain single child translate/rotate/multmatrix node, None for anything else.
+    if not isinstance(shape, sl.OpenSCADObject) or len(shape.children) != 1:
+        return None
+    if shape.is_hole or shape.modifier:
+        return None
+    if shape.name == 'translate':
+        return translation_matrix(shape.params['v'])
+    if shape.name == 'rotate' and shape.params.get('v') is None and np.size(shape.params['a']) == 3:
+        return rotation_matrix(shape.params['a'])
+    if shape.name == 'multmatrix':
+        return np.asarray(shape.params['m'], dtype=float)
+    return None
+
+
+def transform(shape, matrix):
+    # Folds any transforms already wrapping shape into a single multmatrix node.
+    if shape is None:
+        return None
+    matrix = np.asarray(matrix, dtype=float)
+    inner = node_matrix(shape)
+    while inner is not None:
+        matrix = matrix @ inner
+        shape = shape.children[0]
+        inner = node_matrix(shape)
+    return sl.multmatrix(m=matrix.tolist())(shape)
+
+
+@traced
 def mirror(shape, plane=None):
-    debugprint('mirror()')
+    if shape is None:
+        return None
     planes = {
         'XY': [0, 0, 1],
         'YX': [0, 0, -1],
@@ -47,8 +85,8 @@ def mirror(shape, plane=None):
     return sl.mirror(planes[plane])(shape)
 
 
-def union(shapes):
-    debugprint('union()')
+@traced
+def union(shapes, strategy=None):
     shape = None
     for item in shapes:
         if item is not None:
@@ -59,8 +97,8 @@ def union(shapes):
     return shape
 
 
+@traced
 def add(shapes):
-    debugprint('union()')
     shape = None
     for item in shapes:
         if item is not None:
@@ -71,24 +109,27 @@ def add(shapes):
     return shape
 
 
+@traced
 def difference(shape, shapes):
-    debugprint('difference()')
     for item in shapes:
         if item is not None:
             shape -= item
     return shape
 
 
+@traced
 def intersect(shape1, shape2):
     if shape2 is not None:
         return sl.intersection()(shape1, shape2)
     else:
         return shape1
 
+@traced
 def hull_from_points(points):
     return sl.hull()(*points)
 
 
+@traced
 def hull_from_shapes(shapes, points=None):
     hs = []
     if points is not None:
@@ -98,12 +139,13 @@ def hull_from_shapes(shapes, points=None):
     return sl.hull()(*hs)
 
 
+@traced
 def tess_hull(shapes, sl_tol=.5, sl_angTol=1):
     return sl.hull()(*shapes)
 
 
+@traced
 def triangle_hulls(shapes):
-    debugprint('triangle_hulls()')
     hulls = []
     for i in range(len(shapes) - 2):
         hulls.append(hull_from_shapes(shapes[i: (i + 3)]))
@@ -112,19 +154,69 @@ def triangle_hulls(shapes):
 
 
 
+@traced
 def bottom_hull(p, height=0.001):
-    debugprint("bottom_hull()")
-    shape = None
-    for item in p:
-        proj = sl.projection()(p)
-        t_shape = sl.linear_extrude(height=height, twist=0, convexity=0, center=True)(
-            proj
-        )
-        t_shape = sl.translate([0, 0, height / 2 - 10])(t_shape)
-        if shape is None:
-            shape = t_shape
-        shape = sl.hull()(p, shape, t_shape)
-    return shape
+    points = [shape_points(item) for item in p]
+    if all(item is not None for item in points):
+        # Every item resolves to corner points, so the hull with their drop to
+        # z = -10 is worked out here and OpenSCAD gets a finished polyhedron.
+        points = np.concatenate(points)
+        floor_points = points.copy()
+        floor_points[:, 2] = -10
+        return polyhedron_hull(np.concatenate([points, floor_points]))
+
+    proj = sl.projection()(*p)
+    floor = sl.linear_extrude(height=height, twist=0, convexity=0, center=True)(proj)
+    floor = sl.translate([0, 0, height / 2 - 10])(floor)
+    return sl.hull()(*p, floor)
+
+
+def shape_points(shape, matrix=None):
+    # Corner points of a tree of transformed cubes, None if it holds anything else.
+    if matrix is None:
+        matrix = np.identity(4)
+    if not isinstance(shape, sl.OpenSCADObject) or shape.is_hole or shape.modifier:
+        return None
+
+    inner = node_matrix(shape)
+    if inner is None and shape.name == 'mirror' and len(shape.children) == 1:
+        normal = np.asarray(shape.params['v'], dtype=float)
+        normal = normal / np.linalg.norm(normal)
+        inner = np.identity(4)
+        inner[:3, :3] -= 2 * np.outer(normal, normal)
+    if inner is not None:
+        return shape_points(shape.children[0], matrix @ inner)
+
+    if shape.name == 'cube' and not shape.children:
+        size = np.broadcast_to(np.asarray(shape.params['size'], dtype=float), 3)
+        corners = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=float) * size
+        if shape.params.get('center'):
+            corners -= size / 2
+        return corners @ matrix[:3, :3].T + matrix[:3, 3]
+
+    if shape.name in ['union', 'hull'] and shape.children:
+        points = [shape_points(item, matrix) for item in shape.children]
+        if all(item is not None for item in points):
+            return np.concatenate(points)
+    return None
+
+
+def polyhedron_hull(points):
+    hull_calc = sphull(points)
+    faces = []
+    for face_items, equation in zip(hull_calc.simplices, hull_calc.equations):
+        a, b, c = points[face_items]
+        # OpenSCAD wants faces clockwise seen from outside.
+        if np.dot(np.cross(b - a, c - a), equation[:3]) > 0:
+            face_items = face_items[::-1]
+        faces.append([int(item) for item in face_items])
+    used = sorted(set(item for face in faces for item in face))
+    index = {item: i for i, item in enumerate(used)}
+    return sl.polyhedron(
+        points=points[used].tolist(),
+        faces=[[index[item] for item in face] for face in faces],
+    )
+
 
 def polyline(point_list):
     return sl.polygon(point_list)
@@ -135,6 +227,7 @@ def polyline(point_list):
 #     for wire in square.wires().objects:
 #         plane = cq.Workplane('XY').add(cq.Face.makeFromWires(wire))
 
+@traced
 def extrude_poly(outer_poly, inner_polys=None, height=1):
     if inner_polys is not None:
         return sl.linear_extrude(height=height, twist=0, convexity=0, center=True)(outer_poly, *inner_polys)
@@ -142,16 +235,41 @@ def extrude_poly(outer_poly, inner_polys=None, height=1):
         return sl.linear_extrude(height=height, twist=0, convexity=0, center=True)(outer_poly)
 
 
+@traced
 def import_file(fname, convexity=2):
     print("IMPORTING FROM {}".format(fname))
     return sl.import_stl(fname.replace("\\", "/") + ".stl", convexity=convexity)
 
 
+@traced
 def export_file(shape, fname):
     print("EXPORTING TO {}".format(fname))
     sl.scad_render_to_file(shape, fname + ".scad")
+    return fname + ".scad"
 
 
+@traced
 def export_dxf(shape, fname):
     print("NO DXF EXPORT FOR SOLID".format(fname))
-    pass
\ No newline at end of file
+    pass
+
+
+class scad_text(sl.OpenSCADObject):
+    # Already rendered SCAD source, lets serialized shapes rejoin a tree.
+    def __init__(self, text):
+        super().__init__('scad_text', {})
+        self.text = text
+
+    def _render(self, render_holes=False):
+        return self.text
+
+
+serialized_extension = 'scad'
+
+
+def serialize_shape(shape):
+    return sl.scad_render(shape).encode('utf-8')
+
+
+def deserialize_shape(data):
+    return scad_text(data.decode('utf-8'))
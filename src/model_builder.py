@@ -1,7 +1,19 @@
 import os
+import sys
 import copy
-import importlib
+import json
+import time
+import heapq
+import getopt
+import itertools
+import threading
+import traceback
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 from generate_configuration import *
+from build_graph import limit_memory
+from build_queue import BuildQueue
 
 
 base = shape_config
@@ -42,67 +54,414 @@ config_options = [
 ]
 
 
-def create_config(config_options):
-    configurations = [{
-        'config_name': 'DM',
-        'save_dir': 'DM',
-    }]
-    config_options = copy.deepcopy(config_options)
-    for opt in config_options:
-        new_configurations = []
-        for config in configurations:
-            # config['vals'] = []
-            for i_vals, vals in enumerate(opt['vals']):
-                temp_opt = copy.deepcopy(opt)
-                new_config = copy.deepcopy(config)
-                if len(temp_opt['vars']) == 1:
-                    vals=[vals]
-                    if 'val_names' in temp_opt:
-                        temp_opt['val_names'][i_vals] = [temp_opt['val_names'][i_vals]]
-                for i_val, val in enumerate(vals):
-                    new_config[opt['vars'][i_val]] = val
-
-
-                if 'val_names' in temp_opt:
-                    n_input = temp_opt['val_names'][i_vals]
-                else:
-                    n_input = vals
-
-                name_ext = temp_opt['name'].format(*n_input)
-                if not name_ext == '':
-                    new_config['config_name'] += "_" + name_ext
-                new_config['save_dir'] = new_config['config_name']
-                new_configurations.append(new_config)
-        configurations = new_configurations
-
-    return configurations
-
-
-
-def build_release(base, configurations, engines=('solid', 'cadquery')):
-    init = True
+def option_values(opt):
+    # The variable assignments and the name extension for each value of an option.
+    values = []
+    for i_vals, vals in enumerate(opt['vals']):
+        n_input = opt['val_names'][i_vals] if 'val_names' in opt else vals
+        if len(opt['vars']) == 1:
+            vals = [vals]
+            n_input = [n_input]
+        values.append((dict(zip(opt['vars'], vals)), opt['name'].format(*n_input)))
+    return values
+
+
+def iter_configs(config_options, include=None, exclude=None, shard=None):
+    # Yields the configurations one at a time, in create_config order.  include and
+    # exclude are predicates on a configuration.  shard=(i, n) keeps every n-th of the
+    # remaining configurations starting with the i-th (1 <= i <= n), so n machines
+    # given the same options and filters split the matrix without coordination.
+    if shard is not None and not 1 <= shard[0] <= shard[1]:
+        raise ValueError("Shard {}/{} does not exist".format(*shard))
+    options = [option_values(opt) for opt in config_options]
+    i_config = 0
+    for values in itertools.product(*options):
+        config = {'config_name': 'DM'}
+        for assignments, name_ext in values:
+            config.update(assignments)
+            if not name_ext == '':
+                config['config_name'] += "_" + name_ext
+        config['save_dir'] = config['config_name']
+
+        if include is not None and not include(config):
+            continue
+        if exclude is not None and exclude(config):
+            continue
+        if shard is None or i_config % shard[1] == shard[0] - 1:
+            yield config
+        i_config += 1
+
+
+def create_config(config_options, include=None, exclude=None, shard=None):
+    return list(iter_configs(config_options, include, exclude, shard))
+
+
+def config_filter(items, match_all):
+    # Predicate from "var=value" strings, values compare as text.
+    items = [item.split('=', 1) for item in items]
+
+    def matches(config):
+        found = [str(config.get(name)) == value for name, value in items]
+        return all(found) if match_all else any(found)
+    return matches if items else None
+
+
+log_dir = os.path.join(r"..", "things", "logs")
+
+# Seconds per job from earlier releases, keyed by job name.  It lives with the
+# build outputs, keep it between releases (a CI cache) to start from real numbers.
+# Only full builds are recorded, that is releases run with --no-plan.
+timings_file = os.path.join(r"..", "things", "release_timings.json")
+
+# The release workflow timeout.
+release_time_limit = 180 * 60
+
+# Where planned releases share their subassemblies when the base config has no build_cache_dir.
+release_cache_dir = os.path.join(r"..", "cache")
+
+
+def release_jobs(base, configurations, engines=('solid', 'cadquery')):
+    jobs = []
     for config in configurations:
         shape_config = copy.deepcopy(base)
         for item in config:
             shape_config[item] = config[item]
-    
+
         for engine in engines:
-            shape_config['ENGINE'] = engine
-            with open('run_config.json', mode='w') as fid:
-                json.dump(shape_config, fid, indent=4)
-    
-            if init:
-                import dactyl_manuform as dactyl_manuform
-                dactyl_manuform.run()
-                init = False
-            else:
-                importlib.reload(dactyl_manuform)
-                dactyl_manuform.run()
+            job = copy.deepcopy(shape_config)
+            job['ENGINE'] = engine
+            jobs.append(job)
+    return jobs
+
+
+# Job states that count as failures, 'UP TO DATE' jobs found nothing to rebuild.
+failed_states = ('FAILED', 'CRASHED')
+
+
+def job_name(job):
+    return "{}_{}".format(job['config_name'], job['ENGINE'])
+
+
+def run_logged(log_file, build):
+    # Runs build with everything it prints going to log_file, build may return its own status.
+    start = time.time()
+    with open(log_file, mode='w') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            status = build() or 'OK'
+        except Exception:
+            traceback.print_exc()
+            status = 'FAILED'
+    return status, time.time() - start, log_file
+
+
+def build_job(job):
+    # Builds one release configuration.
+    def build():
+        import dactyl_manuform
+        dactyl_manuform.configure(Config(**job))
+        if not dactyl_manuform.run():
+            return 'UP TO DATE'
+    return run_logged(os.path.join(log_dir, job_name(job) + ".log"), build)
+
+
+def build_subassembly(job, name):
+    # Builds one node of a job's release graph into the build cache.
+    def build():
+        import dactyl_manuform
+        dactyl_manuform.configure(Config(**job))
+        node = dactyl_manuform.release_graph().nodes[name]
+        node.fn(**node.kwargs)
+    return run_logged(os.path.join(log_dir, subassembly_name(job, name) + ".log"), build)
+
+
+def subassembly_name(job, name):
+    return "{}_{}".format(job_name(job), name.replace('/', '_'))
+
+
+def job_features(job):
+    # The config fields a build's cost depends on, symmetry as dactyl_manuform derives it.
+    symmetry = job['symmetry']
+    trackball = job['trackball_in_wall'] or 'TRACKBALL' in job['thumb_style']
+    if 'HS_' in job['plate_style'] or (trackball and job['ball_side'] != 'both'):
+        symmetry = 'asymmetric'
+    return {
+        'nrows': job['nrows'],
+        'ncols': job['ncols'],
+        'thumb_style': job['thumb_style'],
+        'plate_style': job['plate_style'],
+        'ENGINE': job['ENGINE'],
+        'symmetry': symmetry,
+    }
+
+
+def load_timings():
+    if not os.path.isfile(timings_file):
+        return {}
+    with open(timings_file, mode='r') as fid:
+        return json.load(fid)
+
+
+def save_timings(timings):
+    with open(timings_file, mode='w') as fid:
+        json.dump(timings, fid, indent=4, sort_keys=True)
+
+
+def record_timings(jobs, results):
+    timings = load_timings()
+    for job, (status, seconds, log_file) in zip(jobs, results):
+        if status == 'OK':
+            timings[job_name(job)] = dict(job_features(job), seconds=round(seconds, 1))
+    save_timings(timings)
+
+
+def prior_cost(features):
+    # A rough guess at the seconds a build takes, the cost model fits its corrections.
+    seconds = features['nrows'] * features['ncols']
+    if features['ENGINE'] == 'cadquery':
+        seconds *= 10
+    if 'TRACKBALL' in features['thumb_style']:
+        seconds *= 2
+    if features['symmetry'] == 'asymmetric':
+        seconds *= 1.5
+    return seconds
+
+
+class CostModel:
+    # log(seconds / prior_cost) as a linear function of log(nrows), log(ncols) and one
+    # term per thumb_style, plate_style, ENGINE and symmetry value, fitted to the
+    # recorded timings.  The ridge pulls every term but the constant towards the
+    # prior, so values without timings yet still get a sensible guess.  Jobs with a
+    # recorded timing of their own simply use it.
+    categories = ('thumb_style', 'plate_style', 'ENGINE', 'symmetry')
+    ridge = 0.1
+
+    def __init__(self, timings):
+        self.timings = timings
+        self.columns = sorted(set((item, entry[item]) for entry in timings.values() for item in self.categories))
+        self.weights = None
+        if timings:
+            x = np.array([self.row(entry) for entry in timings.values()])
+            y = np.log([max(entry['seconds'], 0.1) / prior_cost(entry) for entry in timings.values()])
+            penalty = np.sqrt(self.ridge) * np.identity(x.shape[1])
+            penalty[0, 0] = 0
+            x = np.vstack([x, penalty])
+            y = np.concatenate([y, np.zeros(x.shape[1])])
+            self.weights = np.linalg.lstsq(x, y, rcond=None)[0]
+
+    def row(self, features):
+        row = [1, np.log(features['nrows']), np.log(features['ncols'])]
+        row.extend(features[item] == value for item, value in self.columns)
+        return np.array(row, dtype=float)
+
+    def predict(self, job):
+        if job_name(job) in self.timings:
+            return self.timings[job_name(job)]['seconds']
+        features = job_features(job)
+        if self.weights is None:
+            return prior_cost(features)
+        return prior_cost(features) * float(np.exp(self.row(features) @ self.weights))
+
+
+def schedule(jobs, costs, workers):
+    # Longest job first: the pool starts jobs in submission order, so the slow
+    # ones start early and the short ones fill in the gaps at the end.  Returns
+    # the job order and the makespan that list scheduling predicts.
+    order = sorted(range(len(jobs)), key=lambda i_job: -costs[i_job])
+    finish = [0.0] * max(workers, 1)
+    for i_job in order:
+        heapq.heappush(finish, heapq.heappop(finish) + costs[i_job])
+    return order, max(finish)
+
+
+def print_summary(jobs, results, seconds, costs):
+    rows = [("CONFIG", "ENGINE", "STATUS", "SECONDS", "PREDICTED", "LOG")]
+    for job, (status, job_seconds, log_file), cost in zip(jobs, results, costs):
+        rows.append((job['config_name'], job['ENGINE'], status, "{:.1f}".format(job_seconds), "{:.1f}".format(cost), log_file))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+
+    print("\nRELEASE SUMMARY")
+    for row in rows:
+        print("  ".join(item.ljust(width) for item, width in zip(row, widths)).rstrip())
+    failed = sum(status in failed_states for status, job_seconds, log_file in results)
+    print("{} jobs, {} failed, {:.1f}s wall time".format(len(results), failed, seconds))
+
+
+def plan_release(jobs):
+    # Configurations that differ in a few options share most subassemblies (key well,
+    # connectors, thumb cluster, ...).  Every cached leaf node of every job is looked up
+    # by its cache file, which is keyed by everything the builder reads, and each file
+    # that does not exist yet is built once.  The jobs then load them from the cache.
+    import dactyl_manuform
+    plan = {}
+    count = 0
+    with open(os.path.join(log_dir, "plan.log"), mode='w') as log, contextlib.redirect_stdout(log):
+        for job in jobs:
+            dactyl_manuform.configure(Config(**job))
+            for name, fname in dactyl_manuform.cached_nodes(dactyl_manuform.release_graph()).items():
+                count += 1
+                if fname not in plan and not os.path.isfile(fname):
+                    plan[fname] = (job, name)
+    print("{} subassemblies in {} jobs, {} unique ones to build".format(count, len(jobs), len(plan)))
+    return list(plan.values())
+
+
+def run_tasks(tasks, workers, memory=None):
+    # Runs (name, fn, args) tasks in the given order, returns their results in the same order.
+    # memory is an optional address space limit in bytes for each worker.
+    results = [None] * len(tasks)
+    done = 0
+    if workers <= 1:
+        for i_task, (name, fn, args) in enumerate(tasks):
+            results[i_task] = fn(*args)
+            done += 1
+            print("[{}/{}] {} {} {:.1f}s".format(done, len(tasks), name, *results[i_task][:2]))
+    else:
+        start = time.time()
+        with ProcessPoolExecutor(max_workers=workers, initializer=limit_memory, initargs=(memory,)) as pool:
+            futures = {pool.submit(fn, *args): i_task for i_task, (name, fn, args) in enumerate(tasks)}
+            for future in as_completed(futures):
+                i_task = futures[future]
+                name = tasks[i_task][0]
+                try:
+                    results[i_task] = future.result()
+                except Exception as err:
+                    # The worker died, usually killed for memory, its log holds what it got to.
+                    results[i_task] = ('CRASHED', time.time() - start, os.path.join(log_dir, name + ".log"))
+                    print("{} crashed: {!r}".format(name, err))
+                done += 1
+                print("[{}/{}] {} {} {:.1f}s".format(done, len(tasks), name, *results[i_task][:2]))
+    return results
+
+
+def build_release(base, configurations, engines=('solid', 'cadquery'), workers=None, plan=True, memory=None):
+    # Every job gets its own Config, so jobs run side by side in a process pool, each
+    # worker limited to memory bytes of address space if given.  With plan the shared
+    # subassemblies are built first and the jobs only load them.
+    jobs = release_jobs(base, configurations, engines)
+    os.makedirs(log_dir, exist_ok=True)
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    start = time.time()
+
+    model = CostModel(load_timings())
+    if plan:
+        for job in jobs:
+            if job['build_cache_dir'] in [None, '']:
+                job['build_cache_dir'] = release_cache_dir
+        # Nodes have no timings of their own, the slowest jobs have the heaviest
+        # subassemblies, so they go first by the cost of the job they came from.
+        subassemblies = plan_release(jobs)
+        order, makespan = schedule(subassemblies, [model.predict(job) for job, name in subassemblies], workers)
+        run_tasks([(subassembly_name(*subassemblies[i_task]), build_subassembly, subassemblies[i_task])
+                   for i_task in order], workers, memory)
+
+    costs = [model.predict(job) for job in jobs]
+    order, makespan = schedule(jobs, costs, workers)
+    print("{} jobs on {} workers, estimated {:.1f} minutes".format(len(jobs), workers, makespan / 60))
+    if makespan > release_time_limit:
+        print("WARNING: ESTIMATE EXCEEDS THE {:.0f} MINUTE RELEASE LIMIT".format(release_time_limit / 60))
+
+    ordered = run_tasks([(job_name(jobs[i_job]), build_job, (jobs[i_job],)) for i_job in order], workers, memory)
+    results = [None] * len(jobs)
+    for i_job, result in zip(order, ordered):
+        results[i_job] = result
+
+    if plan:
+        # The jobs only loaded their subassemblies, those seconds say nothing about a full build.
+        print("Planned release, job timings not recorded")
+    else:
+        record_timings(jobs, results)
+    print_summary(jobs, results, time.time() - start, costs)
+    return results
+
+
+def submit_release(queue, base, configurations, engines=('solid', 'cadquery')):
+    # The predicted seconds are the priority, so workers claim the slowest jobs first.
+    jobs = release_jobs(base, configurations, engines)
+    model = CostModel(load_timings())
+    count = sum(queue.submit(job_name(job), job, priority=model.predict(job)) for job in jobs)
+    print("{} of {} jobs queued in {}".format(count, len(jobs), queue.path))
+
+
+def work_release(queue, workers=None, wait=False, memory=None):
+    # One queue worker per slot, each builds its jobs in a child process limited to
+    # memory bytes of address space if given.  Outputs land in things/<save_dir> as usual.
+    os.makedirs(log_dir, exist_ok=True)
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    threads = [
+        threading.Thread(target=queue.work, args=(build_job,),
+                         kwargs=dict(wait=wait, memory=memory, initializer=limit_memory))
+        for i_worker in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    status = queue.status()
+    print("QUEUE: {} done, {} failed, {} pending, {} running".format(
+        *[len(status[item]) for item in ('done', 'failed', 'pending', 'running')]))
+    return status
+
 
 if __name__ == '__main__':
-    configurations = create_config(config_options)
+    # --include var=value keeps configurations matching all of them, --exclude var=value
+    # drops configurations matching any of them, --shard i/n builds the i-th of n slices.
+    # --queue dir with --submit puts the jobs in a shared build queue instead of building
+    # them, --work builds queued jobs until the queue is empty, with --wait for good.
+    # --worker-memory GB limits the address space of each build process.
+    opts, args = getopt.getopt(sys.argv[1:], "", [
+        "workers=", "worker-memory=", "no-plan", "include=", "exclude=", "shard=", "queue=", "submit", "work", "wait"
+    ])
+    workers = None
+    memory = None
+    plan = True
+    queue = None
+    submit = False
+    work = False
+    wait = False
+    includes = []
+    excludes = []
+    shard = None
+    for opt, arg in opts:
+        if opt == '--workers':
+            workers = int(arg)
+        elif opt == '--worker-memory':
+            memory = int(float(arg) * 2**30)
+        elif opt == '--no-plan':
+            plan = False
+        elif opt == '--include':
+            includes.append(arg)
+        elif opt == '--exclude':
+            excludes.append(arg)
+        elif opt == '--shard':
+            shard = tuple(int(item) for item in arg.split('/'))
+        elif opt == '--queue':
+            queue = BuildQueue(arg)
+        elif opt == '--submit':
+            submit = True
+        elif opt == '--work':
+            work = True
+        elif opt == '--wait':
+            wait = True
+    if queue is not None and not (submit or work):
+        raise getopt.GetoptError("--queue needs --submit or --work")
+    if queue is None and (submit or work):
+        raise getopt.GetoptError("--submit and --work need --queue")
+
+    configurations = iter_configs(
+        config_options, include=config_filter(includes, True), exclude=config_filter(excludes, False), shard=shard
+    )
 
     ENGINES = ['solid', 'cadquery']
     # ENGINES = ['solid']
 
-    build_release(base, configurations, ENGINES)
+    if queue is not None:
+        if submit:
+            submit_release(queue, base, configurations, ENGINES)
+        if work:
+            if work_release(queue, workers=workers, wait=wait, memory=memory)['failed']:
+                sys.exit(1)
+    else:
+        results = build_release(base, configurations, ENGINES, workers=workers, plan=plan, memory=memory)
+        if any(status in failed_states for status, seconds, log_file in results):
+            sys.exit(1)
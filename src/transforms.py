@@ -0,0 +1,42 @@
+import numpy as np
+
+
+###############################################
+# 4x4 HOMOGENEOUS TRANSFORMS
+###############################################
+# Shared by both engine helpers and the key placement table, so a placement
+# composed in NumPy is the same matrix whichever engine applies it.
+
+
+def translation_matrix(vector):
+    vector = list(vector)[:3]
+    matrix = np.identity(4)
+    matrix[:len(vector), 3] = vector
+    return matrix
+
+
+def rotation_matrix(angle):
+    # rotate([x, y, z]) in degrees, turns about X, then Y, then Z like OpenSCAD.
+    ax, ay, az = np.radians(angle[:3])
+    return rotation_matrix_z(az) @ rotation_matrix_y(ay) @ rotation_matrix_x(ax)
+
+
+def rotation_matrix_x(angle):
+    # Radians, like the key geometry.
+    matrix = np.identity(4)
+    matrix[1:3, 1:3] = [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    return matrix
+
+
+def rotation_matrix_y(angle):
+    matrix = np.identity(4)
+    matrix[0, 0] = matrix[2, 2] = np.cos(angle)
+    matrix[0, 2] = np.sin(angle)
+    matrix[2, 0] = -np.sin(angle)
+    return matrix
+
+
+def rotation_matrix_z(angle):
+    matrix = np.identity(4)
+    matrix[:2, :2] = [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    return matrix
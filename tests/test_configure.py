@@ -0,0 +1,19 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import dactyl_manuform
+from generate_configuration import Config
+
+
+def oled_mount_key(config):
+    dactyl_manuform.configure(config)
+    return dactyl_manuform.cache_key(dactyl_manuform.oled_mount, (), {})
+
+
+def test_oled_globals_do_not_leak_between_configs():
+    fresh = oled_mount_key(Config(oled_mount_type='NONE'))
+    oled_mount_key(Config(oled_mount_type='CLIP'))
+    assert oled_mount_key(Config(oled_mount_type='NONE')) == fresh
+    assert not hasattr(dactyl_manuform, 'oled_clip_thickness')